@@ -4,43 +4,49 @@ Calculates all previews for all combinations
 of keyboards and layouts.
 """
 
+import functools
 import pathlib
 
-import requests
-from requests.auth import HTTPBasicAuth
-
 from internal.corpus import Corpus
 from internal.keyboard import Keyboard
+from internal.manifest import Manifest
+from internal.models import model_hash
+from internal.setup import *
+from internal.uploader import HTTPTransport, Uploader
 from internal.visualizer import Visualizer
 
+API_URL = 'http://localhost:8000/api'
 USER = ''
 PASSWORD = ''
 
-def report(keyboard, corpora_names):
-    """Calculate all metrics and prepare data for Django API."""
-    visualizer_args = {
-        'color_by': 'home',
-        'combined_2': True,
-        'layers': 1,
-        'show_fingers': False,
-        'show_frequencies': False,
-        'show_home_keys': True,
-        'show_key_codes': False,
-        'show_keys_centers': False,
-        'show_layout': True,
-        'show_modifiers': True,
-        'show_row_numbers': False,
-        'smallcaps': False
-    }
+# Number of simultaneous uploads
+UPLOAD_WORKERS = 4
+
+# Finished combinations with hashes of their inputs
+MANIFEST_PATH = pathlib.Path() / 'data' / '.cache' / 'api_layout_display_all.json'
+
+VISUALIZER_ARGS = {
+    'color_by': 'home',
+    'combined_2': True,
+    'layers': 1,
+    'show_fingers': False,
+    'show_frequencies': False,
+    'show_home_keys': True,
+    'show_key_codes': False,
+    'show_keys_centers': False,
+    'show_layout': True,
+    'show_modifiers': True,
+    'show_row_numbers': False,
+    'smallcaps': False
+}
 
-    # Get id's from database
-    req = requests.get('http://localhost:8000/api/keyboards/', params={'search': keyboard.name})
-    req: dict = req.json()[0]
-    keyboard_id = req.get('id')
+def report(uploader, keyboard, corpora_names):
+    """Calculate all metrics and prepare data for Django API."""
+    visualizer_args = VISUALIZER_ARGS
 
-    req = requests.get('http://localhost:8000/api/layouts/', params={'search': keyboard.layout_name})
-    req: dict = req.json()[0]
-    layout_id = req.get('id')
+    # Get id's from database, once per run
+    keyboard_id = uploader.resource_id('keyboards', keyboard.name)
+    layout_id = uploader.resource_id('layouts', keyboard.layout_name)
 
     # Generate frequency heatmap
     visualizer = Visualizer(keyboard, visualizer_args)
@@ -56,44 +62,14 @@ def report(keyboard, corpora_names):
         'layout': layout_id,
     }
 
-    files = {
-        'layout_preview': open(layout_preview_filename, 'rb'),
-    }
+    return report, layout_preview_filename
+
 
-    return report, files
-
-def upsert(metrics, files):
-    # Check if metric already exists
-    req = requests.get('http://localhost:8000/api/layout-previews/', params={
-        'keyboard__id': metrics['keyboard'],
-        'layout__id': metrics['layout'],
-    })
-
-    # Not exists, create
-    if len(req.json()) == 0:
-        requests.post(
-            'http://localhost:8000/api/layout-previews/',
-            data=metrics,
-            files=files,
-            auth=HTTPBasicAuth(USER, PASSWORD)
-        )
-        print('Status: created')
-        return
-
-    # Exists, update all but not images
-    preview_id = req.json()[0]['id']
-    requests.patch(
-        f'http://localhost:8000/api/layout-previews/{preview_id}/',
-        data=metrics,
-        # files=files
-    )
-    print('Status: updated')
-
-
-def process(keyboard, corpora_names):
-    metrics, files = report(keyboard, corpora_names)
-    upsert(metrics, files)
-    print()
+def process(uploader, keyboard, corpora_names, done):
+    metrics, layout_preview_filename = report(uploader, keyboard, corpora_names)
+
+    # Uploaded in background, while next combination is rendered
+    uploader.submit(metrics, layout_preview_filename, done)
 
     # Display
     # for field in metrics:
@@ -121,13 +97,46 @@ layout_paths = pathlib.Path() / 'data' / 'layouts'
 layout_paths = layout_paths.glob('**/*.yaml')
 layout_paths = [p for p in layout_paths if 'kq' not in p.parts]
 
+ARGS = setup('api_layout_display_all')
+
+# Finished combinations are skipped, if their inputs are not changed
+manifest = Manifest(MANIFEST_PATH, ARGS['only_changed'])
+
 combination = 1
+skipped = 0
+transport = HTTPTransport(API_URL, (USER, PASSWORD), UPLOAD_WORKERS)
+uploader = Uploader(
+    transport, 'layout-previews', ('keyboard', 'layout'), 'layout_preview',
+    UPLOAD_WORKERS, ARGS['batch_size'],
+)
 
 for j, keyboard_path in enumerate(keyboard_paths):
+    keyboard_hash = model_hash(keyboard_path)
+
     for k, layout_path in enumerate(layout_paths):
+        job = f'{keyboard_path.as_posix()}|{layout_path.as_posix()}'
+        inputs = Manifest.inputs_hash(keyboard_hash, model_hash(layout_path), VISUALIZER_ARGS)
+
+        if manifest.is_done(job, inputs):
+            skipped += 1
+            continue
+
         print(f'Combination {combination}')
         print(keyboard_path.name, layout_path.name)
         keyboard = Keyboard.load(keyboard_path, layout_path, Corpus('Empty', ''))
 
-        process(keyboard, corpora_names)
+        process(uploader, keyboard, corpora_names, functools.partial(manifest.finish, job, inputs))
+        print()
         combination += 1
+
+# Wait for last uploads
+uploader.close()
+transport.close()
+
+# Failed combinations are rendered again by next run
+manifest.close(complete=not uploader.errors)
+
+print(f'Created: {uploader.created}, updated: {uploader.updated}, skipped: {skipped}')
+
+for metrics, error in uploader.errors:
+    print(f'Error: {error}')
@@ -4,61 +4,51 @@ Calculates all metrics for all combinations
 of keyboards, layouts and corpora.
 """
 
-import requests
-from requests.auth import HTTPBasicAuth
-
+import functools
 import pathlib
 
 from internal.corpus import Corpus
-from internal.hands import Hands
+from internal.evaluator import Evaluator
+from internal.exporter import Exporter
 from internal.keyboard import Keyboard
-from internal.visualizer import Visualizer
-
+from internal.manifest import Manifest
+from internal.models import model_hash
+from internal.pool import CorpusPool
+from internal.setup import *
+from internal.simulation import simulate
+from internal.uploader import HTTPTransport, Uploader
+
+API_URL = 'http://localhost:8000/api'
 USER = ''
 PASSWORD = ''
 
-def report(keyboard, corpora_names):
-    """Calculate all metrics and prepare data for Django API."""
-    visualizer_args = {
-        'color_by': 'frequency',
-        'combined_2': False,
-        'layers': 1,
-        'show_fingers': False,
-        'show_frequencies': True,
-        'show_home_keys': False,
-        'show_key_codes': False,
-        'show_keys_centers': False,
-        'show_layout': True,
-        'show_modifiers': True,
-        'show_row_numbers': False,
-        'smallcaps': True
-    }
-
-    hands = Hands(keyboard)
-
-    # Get id's from database
-    req = requests.get('http://localhost:8000/api/keyboards/', params={'search': keyboard.name})
-    req: dict = req.json()[0]
-    keyboard_id = req.get('id')
-
-    req = requests.get('http://localhost:8000/api/layouts/', params={'search': keyboard.layout_name})
-    req: dict = req.json()[0]
-    layout_id = req.get('id')
-
-    corpus_name = corpora_names[keyboard.corpus.name]
-    req = requests.get('http://localhost:8000/api/corpora/', params={'search': corpus_name})
-    req: dict = req.json()[0]
-    corpus_id = req.get('id')
-
-    # Generate frequency heatmap
-    visualizer = Visualizer(keyboard, visualizer_args)
-    visualizer.render(visualizer_args['layers'])
-    heatmap_filename = f'{keyboard.layout_file}_{keyboard.file}_{corpus.name}.png'
-    visualizer.savefig(heatmap_filename, dpi=300, transparent=True)
-    visualizer.close()
+# Number of simultaneous uploads
+UPLOAD_WORKERS = 4
+
+# Finished combinations with hashes of their inputs
+MANIFEST_FOLDER = pathlib.Path() / 'data' / '.cache'
+
+VISUALIZER_ARGS = {
+    'color_by': 'frequency',
+    'combined_2': False,
+    'layers': 1,
+    'show_fingers': False,
+    'show_frequencies': True,
+    'show_home_keys': False,
+    'show_key_codes': False,
+    'show_keys_centers': False,
+    'show_layout': True,
+    'show_modifiers': True,
+    'show_row_numbers': False,
+    'smallcaps': True
+}
 
-    # Simulate typing for travel distance
-    hands.simulate_typing(keyboard, corpus, False)
+def report(uploader, keyboard, hands, metrics, corpora_names):
+    """Calculate all metrics and prepare data for Django API."""
+    # Get id's from database, once per run
+    keyboard_id = uploader.resource_id('keyboards', keyboard.name)
+    layout_id = uploader.resource_id('layouts', keyboard.layout_name)
+    corpus_id = uploader.resource_id('corpora', corpora_names[keyboard.corpus.name])
 
     # Prepare metrics data matching Django model
     report = {
@@ -80,90 +70,59 @@ def report(keyboard, corpora_names):
         'travel_distance_finger_10': hands.fingers[10].travel_distance / keyboard.one_unit / corpus.length,
 
         # Finger usage (%)
-        'finger_usage_1': keyboard.finger_usage_frequency(1),
-        'finger_usage_2': keyboard.finger_usage_frequency(2),
-        'finger_usage_3': keyboard.finger_usage_frequency(3),
-        'finger_usage_4': keyboard.finger_usage_frequency(4),
-        'finger_usage_5': keyboard.finger_usage_frequency(5),
-        'finger_usage_6': keyboard.finger_usage_frequency(6),
-        'finger_usage_7': keyboard.finger_usage_frequency(7),
-        'finger_usage_8': keyboard.finger_usage_frequency(8),
-        'finger_usage_9': keyboard.finger_usage_frequency(9),
-        'finger_usage_10': keyboard.finger_usage_frequency(10),
+        'finger_usage_1': metrics['finger_usage_frequency'][0],
+        'finger_usage_2': metrics['finger_usage_frequency'][1],
+        'finger_usage_3': metrics['finger_usage_frequency'][2],
+        'finger_usage_4': metrics['finger_usage_frequency'][3],
+        'finger_usage_5': metrics['finger_usage_frequency'][4],
+        'finger_usage_6': metrics['finger_usage_frequency'][5],
+        'finger_usage_7': metrics['finger_usage_frequency'][6],
+        'finger_usage_8': metrics['finger_usage_frequency'][7],
+        'finger_usage_9': metrics['finger_usage_frequency'][8],
+        'finger_usage_10': metrics['finger_usage_frequency'][9],
 
         # Row usage (%)
-        'row_usage_k': keyboard.row_usage_frequency('K'),
-        'row_usage_e': keyboard.row_usage_frequency('E'),
-        'row_usage_d': keyboard.row_usage_frequency('D'),
-        'row_usage_c': keyboard.row_usage_frequency('C'),
-        'row_usage_b': keyboard.row_usage_frequency('B'),
-        'row_usage_a': keyboard.row_usage_frequency('A'),
+        'row_usage_k': metrics['row_usage_frequency'][0],
+        'row_usage_e': metrics['row_usage_frequency'][1],
+        'row_usage_d': metrics['row_usage_frequency'][2],
+        'row_usage_c': metrics['row_usage_frequency'][3],
+        'row_usage_b': metrics['row_usage_frequency'][4],
+        'row_usage_a': metrics['row_usage_frequency'][5],
 
         # Same Finger Bigrams (SFB)
-        'same_finger_bigram_frequency': keyboard.same_finger_bigram_frequency,
-        'same_finger_bigram_mean_distance': keyboard.same_finger_bigram_mean_distance,
+        'same_finger_bigram_frequency': metrics['same_finger_bigram_frequency'],
+        'same_finger_bigram_mean_distance': metrics['same_finger_bigram_mean_distance'],
 
         # Same Finger Skipgrams (SFS)
-        'same_finger_skipgram_frequency': keyboard.same_finger_skipgram_frequency,
-        'same_finger_skipgram_mean_distance': keyboard.same_finger_skipgram_mean_distance,
+        'same_finger_skipgram_frequency': metrics['same_finger_skipgram_frequency'],
+        'same_finger_skipgram_mean_distance': metrics['same_finger_skipgram_mean_distance'],
 
         # Scissors
-        'half_scissor_bigram_frequency': keyboard.half_scissor_bigram_frequency,
-        'full_scissor_bigram_frequency': keyboard.full_scissor_bigram_frequency,
+        'half_scissor_bigram_frequency': metrics['half_scissor_bigram_frequency'],
+        'full_scissor_bigram_frequency': metrics['full_scissor_bigram_frequency'],
 
-        'half_scissor_skipgram_frequency': keyboard.half_scissor_skipgram_frequency,
-        'full_scissor_skipgram_frequency': keyboard.full_scissor_skipgram_frequency,
+        'half_scissor_skipgram_frequency': metrics['half_scissor_skipgram_frequency'],
+        'full_scissor_skipgram_frequency': metrics['full_scissor_skipgram_frequency'],
 
         # Lateral Stretch Bigrams (LSB)
-        'lateral_stretch_bigram_frequency': keyboard.lateral_stretch_bigram_frequency,
-        'lateral_stretch_skipgram_frequency': keyboard.lateral_stretch_skipgram_frequency,
+        'lateral_stretch_bigram_frequency': metrics['lateral_stretch_bigram_frequency'],
+        'lateral_stretch_skipgram_frequency': metrics['lateral_stretch_skipgram_frequency'],
 
         # Trigrams
-        'roll_frequency': keyboard.roll_frequency,
-        'alternate_frequency': keyboard.alternate_frequency,
-        'onehand_frequency': keyboard.onehand_frequency,
-        'redirect_frequency': keyboard.redirect_frequency,
+        'roll_frequency': metrics['roll_frequency'],
+        'alternate_frequency': metrics['alternate_frequency'],
+        'onehand_frequency': metrics['onehand_frequency'],
+        'redirect_frequency': metrics['redirect_frequency'],
     }
 
-    files = {
-        'frequency_heatmap': open(heatmap_filename, 'rb'),
-    }
-
-    return report, files
-
-def upsert(metrics, files):
-    # Check if metric already exists
-    req = requests.get('http://localhost:8000/api/metrics/', params={
-        'corpus__id': metrics['corpus'],
-        'keyboard__id': metrics['keyboard'],
-        'layout__id': metrics['layout'],
-    })
-
-    # Not exists, create
-    if len(req.json()) == 0:
-        requests.post(
-            'http://localhost:8000/api/metrics/',
-            data=metrics,
-            files=files,
-            auth=HTTPBasicAuth(USER, PASSWORD)
-        )
-        print('Status: created')
-        return
+    return report
 
-    # Exists, update all but not images
-    metric_id = req.json()[0]['id']
-    requests.patch(
-        f'http://localhost:8000/api/metrics/{metric_id}/',
-        data=metrics,
-        # files=files
-    )
-    print('Status: updated')
 
+def process(uploader, keyboard, hands, metrics, heatmap_filename, corpora_names, done):
+    metrics = report(uploader, keyboard, hands, metrics, corpora_names)
 
-def process(keyboard, corpora_names):
-    metrics, files = report(keyboard, corpora_names)
-    upsert(metrics, files)
-    print()
+    # Uploaded in background, while next combination is calculated
+    uploader.submit(metrics, heatmap_filename, done)
 
     # Display
     # for field in metrics:
@@ -184,7 +143,7 @@ corpora_names = {
 }
 
 corpora_paths = pathlib.Path() / 'data' / 'corpora' / 'clean'
-corpora_paths = [*corpora_paths.glob('*')]
+corpora_paths = [p for p in corpora_paths.glob('*') if p.is_dir()]
 
 keyboard_paths = pathlib.Path() / 'data' / 'keyboards'
 keyboard_paths = [*keyboard_paths.glob('*.yaml')]
@@ -194,19 +153,89 @@ layout_paths = pathlib.Path() / 'data' / 'layouts'
 layout_paths = layout_paths.glob('**/*.yaml')
 layout_paths = [p for p in layout_paths if 'kq' not in p.parts]
 
-combination = 1
+# Workers of corpus pool import this script again, so they skip its work
+if __name__ == '__main__':
+    ARGS = setup('api_metric_all')
+
+    # Finished combinations are skipped, if their inputs are not changed
+    # Combinations are finished separately for backend and each export
+    manifest_name = f'api_metric_all_{pathlib.Path(ARGS["export"]).name}' if ARGS['export'] else 'api_metric_all'
+    manifest = Manifest(MANIFEST_FOLDER / f'{manifest_name}.json', ARGS['only_changed'])
+    keyboard_hashes = [model_hash(path) for path in keyboard_paths]
+    layout_hashes = [model_hash(path) for path in layout_paths]
+
+    # Metrics of all combinations are calculated at once for each corpus
+    evaluator = Evaluator.load(keyboard_paths, layout_paths)
+
+    combination = 1
+    skipped = 0
+    if ARGS['export']:
+        # Metrics are written to local file instead of backend
+        transport = None
+        uploader = Exporter(
+            ARGS['export'], 'metrics', ('corpus', 'keyboard', 'layout'), 'frequency_heatmap',
+        )
+    else:
+        transport = HTTPTransport(API_URL, (USER, PASSWORD), UPLOAD_WORKERS)
+        uploader = Uploader(
+            transport, 'metrics', ('corpus', 'keyboard', 'layout'), 'frequency_heatmap',
+            UPLOAD_WORKERS, ARGS['batch_size'],
+        )
 
-for i, corpus_path in enumerate(corpora_paths):
-    corpus = Corpus.load(corpus_path)
+    for i, corpus_path in enumerate(corpora_paths):
+        corpus_hash = Corpus.fingerprint(corpus_path)
+        combinations = []
 
-    for j, keyboard_path in enumerate(keyboard_paths):
-        for k, layout_path in enumerate(layout_paths):
-            if corpus_to_code[corpus.name] not in layout_path.parts:
-                continue
+        for j, keyboard_path in enumerate(keyboard_paths):
+            for k, layout_path in enumerate(layout_paths):
+                if corpus_to_code[corpus_path.name] not in layout_path.parts:
+                    continue
 
-            print(f'Combination {combination}')
-            print(corpus.name, keyboard_path.name, layout_path.name)
-            keyboard = Keyboard.load(keyboard_path, layout_path, corpus)
+                job = f'{corpus_path.as_posix()}|{keyboard_path.as_posix()}|{layout_path.as_posix()}'
+                inputs = Manifest.inputs_hash(
+                    corpus_hash, keyboard_hashes[j], layout_hashes[k], VISUALIZER_ARGS
+                )
+
+                if manifest.is_done(job, inputs):
+                    skipped += 1
+                    continue
+
+                combinations.append((j, k, job, inputs))
+
+        if not combinations:
+            continue
+
+        corpus = Corpus.map(corpus_path)
+        grid = evaluator.evaluate(corpus)
 
-            process(keyboard, corpora_names)
+        # Combinations are split between processes sharing corpus counts
+        results = CorpusPool(corpus, ARGS['workers']).map(simulate, [
+            (keyboard_paths[j], layout_paths[k]) for j, k, _, _ in combinations
+        ], VISUALIZER_ARGS)
+
+        for (hands, heatmap_filename), (j, k, job, inputs) in zip(results, combinations):
+            keyboard = Keyboard.load(keyboard_paths[j], layout_paths[k], corpus)
+
+            print(f'Combination {combination}')
+            print(corpus.name, keyboard.file, keyboard.layout_file)
+
+            metrics = {name: values[j, k].tolist() for name, values in grid.items()}
+            process(
+                uploader, keyboard, hands, metrics, heatmap_filename, corpora_names,
+                functools.partial(manifest.finish, job, inputs),
+            )
+            print()
             combination += 1
+
+    # Wait for last uploads
+    uploader.close()
+    if transport:
+        transport.close()
+
+    # Failed combinations are calculated again by next run
+    manifest.close(complete=not uploader.errors)
+
+    print(f'Created: {uploader.created}, updated: {uploader.updated}, skipped: {skipped}')
+
+    for metrics, error in uploader.errors:
+        print(f'Error: {error}')
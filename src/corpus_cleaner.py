@@ -10,7 +10,7 @@ from internal.corpus import Corpus
 from internal.setup import *
 
 ARGS = setup('corpus_cleaner')
-corpus = Corpus.load(ARGS['corpus'])
+corpus = Corpus.load(ARGS['corpus'], keep_text=True)
 
 length_before = corpus.length
 chars_before = corpus.chars
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache():
+    """Thread safe cache, least recently used values are dropped first."""
+
+    def __init__(self, size: int):
+        """Create empty cache for given number of values."""
+        self.size = size
+        self._values: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return cached value or None, marking it as recently used."""
+        with self._lock:
+            if key not in self._values:
+                return None
+
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def put(self, key, value):
+        """Cache value, dropping least recently used over size."""
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+    def pop(self, key):
+        """Drop cached value, if it exists."""
+        with self._lock:
+            self._values.pop(key, None)
+
+    def __len__(self) -> int:
+        """Return number of cached values."""
+        return len(self._values)
@@ -1,51 +1,277 @@
 from __future__ import annotations
 
+import codecs
+import hashlib
+import io
+import multiprocessing
+import os
 import pathlib
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from functools import cached_property
+from itertools import repeat
 
+import numpy as np
 from yaml import safe_load
 
+from internal.mapped_text import MappedText
+from internal.ngrams import NgramCounts
+
+# Characters read from corpus file at once
+CHUNK_SIZE = 1 << 20
+
+# Changes with the way text is decoded and counted, so old caches are dropped
+COUNTS_VERSION = 3
+
 class Corpus():
     """Set of text used to calculate statistics.
 
     Used to calculate information about given
-    set of text.
+    set of text. Text is optional, corpus loaded
+    by chunks keeps only n-gram counts, and mapped
+    corpus reads text from memory mapped files.
     """
 
-    def __init__(self, name, text):
+    def __init__(self, name, text: str | None = None):
         """Created corpus from given text."""
         self.name = name
         self.text = text
+        self.mapped: MappedText | None = None
+
+        # Changes each time text is changed
+        self.version = 0
 
     def _drop_cache(self):
         """Drops cached values. If a field doesn't exist, it's skipped."""
-        for attr in ('length', 'unigrams', 'bigrams', 'trigrams'):
+        self.version += 1
+
+        for attr in ('counts', 'length', 'unigrams', 'bigrams', 'trigrams'):
             try:
                 delattr(self, attr)
             except AttributeError:
                 pass
 
-    @classmethod 
-    def load(self, corpus_folder) -> Corpus:
-        """Load corpus from given folder and name it after it."""
-        text = ''
-        files_to_process = set()
+    def _require_text(self):
+        """Raise error if corpus was loaded without text."""
+        if self.text is None:
+            raise ValueError(f'Corpus {self.name} is loaded without text')
 
-        # Gather all text from source directory
+    @staticmethod
+    def _files(corpus_folder) -> list[pathlib.Path]:
+        """Return sorted list of corpus files in given folder."""
         path = pathlib.Path(corpus_folder)
-        name = path.name
 
-        if path.is_dir():
-            files_to_process.update(path.glob('**/*'))
-        else:
+        if not path.is_dir():
             raise FileNotFoundError(f'Corpus on path {path} is not found')
 
-        for file in files_to_process:
+        return sorted(file for file in path.glob('**/*') if file.is_file())
+
+    @staticmethod
+    def _fingerprint(corpus_folder, files: list[pathlib.Path]) -> str:
+        """Return hash of corpus file names, sizes and modification times."""
+        fingerprint = hashlib.sha256(f'{COUNTS_VERSION}\n'.encode())
+
+        for file in files:
+            stat = file.stat()
+            name = file.relative_to(corpus_folder).as_posix()
+            fingerprint.update(f'{name}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+
+        return fingerprint.hexdigest()
+
+    @staticmethod
+    def fingerprint(corpus_folder) -> str:
+        """Return hash of corpus folder, changes with any of its files."""
+        return Corpus._fingerprint(corpus_folder, Corpus._files(corpus_folder))
+
+    @staticmethod
+    def cache_path(corpus_folder) -> pathlib.Path:
+        """Return path of n-gram cache file placed next to corpus folder."""
+        path = pathlib.Path(corpus_folder)
+        return path.parent / f'{path.name}.npz'
+
+    @staticmethod
+    def _read_chunks(files: list[pathlib.Path], chunk_size: int = CHUNK_SIZE):
+        """Yield text of given files by chunks of fixed size."""
+        for file in files:
             with open(file, encoding='utf-8', errors='ignore') as file:
-                text += file.read()
+                while chunk := file.read(chunk_size):
+                    yield chunk
+
+    @staticmethod
+    def _align(file: pathlib.Path, position: int) -> int:
+        """Move byte position forward to start of character.
+
+        Also keeps CRLF line ending in one range.
+        """
+        if position <= 0:
+            return 0
+
+        with open(file, 'rb') as source:
+            source.seek(position - 1)
+            data = source.read(6)
+
+        offset = 1
+        while offset < len(data) and 0x80 <= data[offset] < 0xC0:
+            offset += 1
+
+        if data[offset - 1:offset + 1] == b'\r\n':
+            offset += 1
+
+        return position + offset - 1
+
+    @staticmethod
+    def _split_ranges(files: list[pathlib.Path], parts: int) -> list[list[tuple]]:
+        """Split files into tasks of consecutive byte ranges.
+
+        Tasks are close by size, large files are split
+        into several ranges.
+        """
+        sizes = [file.stat().st_size for file in files]
+        part_size = max(sum(sizes) // parts, 1)
+
+        tasks = []
+        task = []
+        task_size = 0
 
-        return Corpus(name, text)
+        for file, size in zip(files, sizes):
+            start = 0
+
+            while start < size:
+                end = min(start + part_size - task_size, size)
+                end = min(Corpus._align(file, end), size)
+
+                task.append((file, start, end))
+                task_size += end - start
+                start = end
+
+                if task_size >= part_size:
+                    tasks.append(task)
+                    task = []
+                    task_size = 0
+
+        if task:
+            tasks.append(task)
+
+        return tasks
+
+    @staticmethod
+    def _count_ranges(ranges: list[tuple], chunk_size: int) -> NgramCounts:
+        """Count n-grams of consecutive byte ranges of files."""
+        counts = NgramCounts()
+
+        for file, start, end in ranges:
+            # Same decoding as text mode of open()
+            decoder = io.IncrementalNewlineDecoder(
+                codecs.getincrementaldecoder('utf-8')(errors='ignore'),
+                translate=True
+            )
+
+            with open(file, 'rb') as source:
+                source.seek(start)
+
+                while start < end:
+                    data = source.read(min(chunk_size, end - start))
+                    if not data:
+                        break
+
+                    start += len(data)
+                    counts.update(decoder.decode(data))
+
+            counts.update(decoder.decode(b'', final=True))
+
+        return counts
+
+    @staticmethod
+    def _count(files: list[pathlib.Path], chunk_size: int, workers: int) -> NgramCounts:
+        """Count n-grams of files. Uses process pool for several workers.
+
+        Zero workers means one worker per CPU core.
+        """
+        workers = workers or os.cpu_count()
+
+        if workers == 1:
+            counts = NgramCounts()
+            for chunk in Corpus._read_chunks(files, chunk_size):
+                counts.update(chunk)
+
+            return counts
+
+        tasks = Corpus._split_ranges(files, workers * 4)
+
+        # Forked workers don't import main script again
+        context = None
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+
+        counts = NgramCounts()
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            for part in executor.map(Corpus._count_ranges, tasks, repeat(chunk_size)):
+                counts.merge(part)
+
+        return counts
+
+    @classmethod 
+    def load(self, corpus_folder, keep_text: bool = False, chunk_size: int = CHUNK_SIZE, cache: bool = True, workers: int = 1) -> Corpus:
+        """Load corpus from given folder and name it after it.
+
+        Files are streamed by chunks into n-gram counters, so whole
+        text is never held in memory. Use `keep_text` if raw text
+        of corpus is required.
+
+        Counts are cached in npz file next to corpus folder and reused
+        while names, sizes and modification times of files are same.
+        Several `workers` count byte ranges of files in parallel.
+        """
+        name = pathlib.Path(corpus_folder).name
+        files = Corpus._files(corpus_folder)
+
+        if keep_text:
+            text = ''.join(Corpus._read_chunks(files, chunk_size))
+            return Corpus(name, text)
+
+        cache_path = Corpus.cache_path(corpus_folder)
+        key = Corpus._fingerprint(corpus_folder, files)
+        counts = NgramCounts.load(cache_path, key) if cache else None
+
+        if counts is None:
+            counts = Corpus._count(files, chunk_size, workers)
+
+            if cache:
+                counts.save(cache_path, key)
+
+        corpus = Corpus(name)
+        corpus.counts = counts
+
+        return corpus
+
+    @classmethod
+    def map(self, corpus_folder, cache: bool = True) -> Corpus:
+        """Open cleaned corpus from given folder as memory mapped files.
+
+        Text is never read into memory at once, n-grams are counted
+        by windows decoded from mapped pages. Takes cached counts if
+        they exist.
+        """
+        name = pathlib.Path(corpus_folder).name
+        files = Corpus._files(corpus_folder)
+
+        corpus = Corpus(name)
+        corpus.mapped = MappedText(files)
+
+        cache_path = Corpus.cache_path(corpus_folder)
+        key = Corpus._fingerprint(corpus_folder, files)
+        counts = NgramCounts.load(cache_path, key) if cache else None
+
+        if counts is None:
+            counts = NgramCounts()
+            for points in corpus.mapped.points():
+                counts.update_points(points)
+
+            if cache:
+                counts.save(cache_path, key)
+
+        corpus.counts = counts
+        return corpus
 
     @classmethod
     def load_mockup(self, unigram_frequency_path):
@@ -60,40 +286,106 @@ class Corpus():
         corpus.unigrams = unigrams['frequencies']
         return corpus
 
+    def chunks(self, chunk_size: int = CHUNK_SIZE):
+        """Yield corpus text by chunks."""
+        if self.mapped is not None:
+            yield from self.mapped.chunks(chunk_size)
+            return
+
+        self._require_text()
+        for i in range(0, len(self.text), chunk_size):
+            yield self.text[i:i+chunk_size]
+
+    def ranges(self, chunk_size: int = CHUNK_SIZE) -> list[tuple[int, int, int]]:
+        """Return bounds of corpus text chunks as (source, start, end)."""
+        if self.mapped is not None:
+            return self.mapped.windows(chunk_size)
+
+        self._require_text()
+        return [
+            (0, i, min(i + chunk_size, len(self.text)))
+            for i in range(0, len(self.text), chunk_size)
+        ]
+
+    def range_points(self, chunk: tuple[int, int, int]) -> np.ndarray:
+        """Return code points of corpus text chunk by its bounds."""
+        if self.mapped is not None:
+            return self.mapped.window_points(chunk)
+
+        _, start, end = chunk
+        return NgramCounts.points(self.text[start:end])
+
+    def points(self, chunk_size: int = CHUNK_SIZE):
+        """Yield code points of corpus text by chunks."""
+        for chunk in self.ranges(chunk_size):
+            yield self.range_points(chunk)
+
     @property
     def chars(self) -> str:
         """Return sorted string of corpus unique chars."""
+        if self.text is None:
+            return ''.join(sorted(self.counts.alphabet))
+
         return ''.join(sorted(set(self.text)))
 
     @cached_property
     def length(self) -> int:
         """Return length of all corpus content."""
+        if self.text is None:
+            return int(self.counts.unigrams.sum())
+
         return len(self.text)
 
+    @cached_property
+    def counts(self) -> NgramCounts:
+        """Returns dense n-gram counts of corpus text."""
+        self._require_text()
+        return NgramCounts.from_text(self.text, CHUNK_SIZE)
+
+    @property
+    def alphabet(self) -> str:
+        """Return corpus chars in order of count tensors indexes."""
+        return self.counts.alphabet
+
+    @property
+    def unigram_counts(self) -> np.ndarray:
+        """Returns vector of unigram counts by alphabet index."""
+        return self.counts.unigrams
+
+    @property
+    def bigram_counts(self) -> np.ndarray:
+        """Returns matrix of bigram counts by alphabet indexes."""
+        return self.counts.bigrams
+
+    @property
+    def trigram_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns alphabet indexes of used trigrams and their counts."""
+        return self.counts.trigrams
+
+    @property
+    def skipgram_counts(self) -> np.ndarray:
+        """Returns matrix of 1-skipgram counts by alphabet indexes."""
+        return self.counts.skipgrams
+
     @cached_property
     def unigrams(self) -> Counter:
         """Returns counter dict of corpus unigrams."""
-        unigrams = Counter(self.text)
-        return unigrams
+        return self.counts.counter(1)
 
     @cached_property
     def bigrams(self) -> Counter:
         """Returns counter dict of corpus bigrams."""
-        groups = (self.text[i:i+2] for i in range(len(self.text) - 1))
-        bigrams = Counter(groups) 
-
-        return bigrams
+        return self.counts.counter(2)
 
     @cached_property
     def trigrams(self) -> Counter:
         """Returns counter dict of corpus trigrams."""
-        groups = (self.text[i:i+3] for i in range(len(self.text) - 2))
-        trigrams = Counter(groups) 
-
-        return trigrams
+        return self.counts.counter(3)
 
     def clean(self, allowed_chars: str | set = None, filter_func: callable = None):
         """Filger corpus text by given chars or function."""
+        self._require_text()
+
         if allowed_chars:
             self.text = ''.join(
                 [key for key in self.text if key in allowed_chars]
@@ -108,6 +400,7 @@ class Corpus():
 
     def limit(self, length):
         """Strip corpus content by given length."""
+        self._require_text()
         self.text = self.text[:length]
         self._drop_cache()
 
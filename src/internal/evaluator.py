@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import numpy as np
+
+from internal.corpus import Corpus
+from internal.geometry import Geometry
+from internal.keyboard import Keyboard
+from internal.models import load_model
+
+# Elements of gathered n-gram arrays processed at once
+BLOCK_SIZE = 1 << 22
+
+
+class Evaluator():
+    """Batch evaluation of layouts on keyboards by corpora.
+
+    Layouts are stacked as arrays of key indexes by corpus
+    characters, keyboards as padded matrices of key pair
+    features. Metrics of all combinations are gathered
+    from shared n-gram counts of corpus at once.
+    """
+
+    def __init__(self, keyboard_models: list[dict], layout_models: list[dict]):
+        """Stack features of physical keys of all keyboards."""
+        self.keyboard_models = keyboard_models
+        self.layout_models = layout_models
+
+        # Only physical keys are used, layouts are stacked separately
+        geometries = [Geometry.from_model(model) for model in keyboard_models]
+
+        # Last key index of padded matrices marks unmapped characters
+        size = max(len(geometry) for geometry in geometries) + 1
+        self.unmapped = size - 1
+        shape = (len(geometries), size, size)
+
+        self.one_unit = np.array([geometry.one_unit for geometry in geometries], dtype=float)
+        self.distances = np.zeros(shape, dtype=float)
+        self.same_finger = np.zeros(shape, dtype=bool)
+        self.scissors = np.zeros(shape, dtype=np.int8)
+        self.lateral_stretches = np.zeros(shape, dtype=bool)
+
+        # Unmapped characters have no finger and row
+        self.fingers = np.full(shape[:2], 10, dtype=np.int64)
+        self.rows = np.full(shape[:2], len(Keyboard.Row), dtype=np.int64)
+
+        # Rows out of enumeration are not counted in row usages
+        rows = {row: i for i, row in enumerate(Keyboard.Row)}
+        for i, geometry in enumerate(geometries):
+            n = len(geometry)
+
+            self.distances[i, :n, :n] = geometry.distances
+            self.same_finger[i, :n, :n] = geometry.same_finger
+            self.scissors[i, :n, :n] = geometry.scissors
+            self.lateral_stretches[i, :n, :n] = geometry.lateral_stretches
+            self.fingers[i, :n] = geometry.fingers - 1
+            self.rows[i, :n] = [rows.get(row, len(rows)) for row in geometry.rows]
+
+        # Layouts are mapped on keys same way as by keyboards
+        self.overlays = [
+            [geometry.overlay(layout_model) for layout_model in layout_models]
+            for geometry in geometries
+        ]
+
+    @classmethod
+    def load(self, keyboard_model_paths: list, layout_model_paths: list) -> Evaluator:
+        """Load keyboards and layouts from YAML models."""
+        keyboard_models = [load_model(path) for path in keyboard_model_paths]
+        layout_models = [load_model(path) for path in layout_model_paths]
+
+        return Evaluator(keyboard_models, layout_models)
+
+    def char_indexes(self, corpus: Corpus) -> np.ndarray:
+        """Return key indexes of corpus characters.
+
+        Array is shaped by keyboards, layouts and alphabet. Characters
+        are mapped to keys same way as by `Keyboard`, repeated ones
+        to last key with them.
+        """
+        alphabet = {char: i for i, char in enumerate(corpus.alphabet)}
+        shape = (len(self.overlays), len(self.layout_models), len(alphabet))
+        indexes = np.full(shape, self.unmapped, dtype=np.int64)
+
+        for i, overlays in enumerate(self.overlays):
+            for j, overlay in enumerate(overlays):
+                for char, index in overlay.mapping_to_index.items():
+                    if char in alphabet:
+                        indexes[i, j, alphabet[char]] = index
+
+        return indexes
+
+    def key_usages(self, corpus: Corpus) -> np.ndarray:
+        """Return usages of keys shaped by keyboards, layouts and keys.
+
+        Keys are counted same way as by `Keyboard.usage_table`,
+        repeated mappings on each of their keys, modifiers as zero.
+        """
+        shape = (len(self.overlays), len(self.layout_models), self.unmapped + 1)
+        usages = np.zeros(shape, dtype=np.int64)
+
+        for i, overlays in enumerate(self.overlays):
+            for j, overlay in enumerate(overlays):
+                for index, key_layout in enumerate(overlay.key_layouts):
+                    if key_layout.get('is_modifier', False):
+                        continue
+
+                    usages[i, j, index] = sum(
+                        corpus.char_usage(mapping)
+                        for mapping in key_layout.get('mappings', {}).values()
+                    )
+
+        return usages
+
+    def _blocks(self, indexes: np.ndarray, ngrams: int) -> list[slice]:
+        """Return slices of layouts to gather n-grams by blocks."""
+        keyboards, layouts, _ = indexes.shape
+        step = max(BLOCK_SIZE // max(keyboards * ngrams, 1), 1)
+
+        return [slice(i, i + step) for i in range(0, layouts, step)]
+
+    def _pair_sums(self, indexes: np.ndarray, first: np.ndarray, second: np.ndarray, usages: np.ndarray) -> dict[str, np.ndarray]:
+        """Return usages of character pairs summed by features of their keys."""
+        sums = {
+            name: np.zeros(indexes.shape[:2], dtype=dtype)
+            for name, dtype in (
+                ('usage', np.int64),
+                ('distance', float),
+                ('same_finger', np.int64),
+                ('same_finger_distance', float),
+                ('full_scissor', np.int64),
+                ('half_scissor', np.int64),
+                ('lateral_stretch', np.int64),
+            )
+        }
+        size = self.unmapped + 1
+        keyboards = np.arange(len(indexes))[:, None, None] * size
+
+        same_finger = self.same_finger.ravel()
+        scissors = self.scissors.ravel()
+        distances = self.distances.ravel()
+        lateral_stretches = self.lateral_stretches.ravel()
+
+        for block in self._blocks(indexes, len(usages)):
+            a = indexes[:, block][:, :, first]
+            b = indexes[:, block][:, :, second]
+
+            # Flat indexes of key pairs in stacked matrices
+            pairs = (keyboards + a) * size + b
+            pair_same_finger = same_finger[pairs]
+            pair_scissors = scissors[pairs]
+            pair_distances = distances[pairs]
+
+            sums['usage'][:, block] = ((a != self.unmapped) & (b != self.unmapped)) @ usages
+            sums['distance'][:, block] = pair_distances @ usages
+            sums['same_finger'][:, block] = pair_same_finger @ usages
+            sums['same_finger_distance'][:, block] = (pair_distances * pair_same_finger) @ usages
+            sums['full_scissor'][:, block] = (pair_scissors == Keyboard.Scissor.FULL) @ usages
+            sums['half_scissor'][:, block] = (pair_scissors == Keyboard.Scissor.HALF) @ usages
+            sums['lateral_stretch'][:, block] = lateral_stretches[pairs] @ usages
+
+        return sums
+
+    def _pattern_sums(self, indexes: np.ndarray, first: np.ndarray, second: np.ndarray, third: np.ndarray, usages: np.ndarray) -> dict[str, np.ndarray]:
+        """Return usages of trigrams summed by patterns of their fingers."""
+        patterns = Keyboard.finger_patterns()
+        sums = {name: np.zeros(indexes.shape[:2], dtype=np.int64) for name in patterns}
+
+        # Pattern number of finger triples, patterns don't overlap
+        lookup = np.full((11, 11, 11), len(patterns), dtype=np.uint8)
+        for i, mask in enumerate(patterns.values()):
+            lookup[:10, :10, :10][mask] = i
+        lookup = lookup.ravel()
+
+        # Small integers make gathering of finger triples faster
+        fingers = np.take_along_axis(self.fingers[:, None, :], indexes, axis=2).astype(np.uint8)
+        usages = usages.astype(float)
+
+        for block in self._blocks(indexes, len(usages)):
+            block_fingers = fingers[:, block]
+            codes = lookup[
+                (block_fingers[:, :, first].astype(np.int16) * 11 + block_fingers[:, :, second]) * 11
+                + block_fingers[:, :, third]
+            ]
+
+            # Usages are integers, so float sums are exact
+            for i, name in enumerate(patterns):
+                sums[name][:, block] = np.rint((codes == i) @ usages)
+
+        return sums
+
+    def evaluate(self, corpus: Corpus) -> dict[str, np.ndarray]:
+        """Calculate metrics of all keyboards and layouts by corpus.
+
+        Metrics are shaped by keyboards and layouts, finger and
+        row usages have extra axis of fingers and rows.
+        """
+        indexes = self.char_indexes(corpus)
+        key_usages = self.key_usages(corpus)
+        mapped = indexes != self.unmapped
+        one_unit = self.one_unit[:, None]
+
+        bigrams = corpus.bigram_counts
+        trigrams, trigram_usages = corpus.trigram_counts
+
+        first, second = np.nonzero(bigrams)
+        bigram_sums = self._pair_sums(indexes, first, second, bigrams[first, second])
+
+        # Middle character of skipgram may be not mapped
+        skipgrams = corpus.skipgram_counts
+        first, third = np.nonzero(skipgrams)
+        skipgram_sums = self._pair_sums(indexes, first, third, skipgrams[first, third])
+
+        first, second, third = trigrams.T
+        pattern_sums = self._pattern_sums(
+            indexes, first, second, third, trigram_usages
+        )
+
+        # N-grams of same characters are not same-finger ones
+        sfb_weight = bigram_sums['same_finger'] - mapped @ np.diagonal(bigrams)
+        sfs_weight = skipgram_sums['same_finger'] - mapped @ np.diagonal(skipgrams)
+
+        bigram_total = bigrams.sum()
+        trigram_total = trigram_usages.sum()
+
+        # Usages of keys by fingers and rows
+        fingers = self.fingers[:, None, :]
+        rows = self.rows[:, None, :]
+        usage = key_usages.sum(axis=2)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'bigram_mean_distance': bigram_sums['distance'] / bigram_sums['usage'] / one_unit,
+                'same_finger_bigram_frequency': sfb_weight / bigram_total,
+                'same_finger_bigram_mean_distance': np.where(
+                    sfb_weight != 0, bigram_sums['same_finger_distance'] / sfb_weight / one_unit, 0.0
+                ),
+                'full_scissor_bigram_frequency': bigram_sums['full_scissor'] / bigram_total,
+                'half_scissor_bigram_frequency': bigram_sums['half_scissor'] / bigram_total,
+                'lateral_stretch_bigram_frequency': bigram_sums['lateral_stretch'] / bigram_total,
+                'same_finger_skipgram_frequency': sfs_weight / trigram_total,
+                'same_finger_skipgram_mean_distance': np.where(
+                    sfs_weight != 0, skipgram_sums['same_finger_distance'] / sfs_weight / one_unit, 0.0
+                ),
+                'full_scissor_skipgram_frequency': skipgram_sums['full_scissor'] / trigram_total,
+                'half_scissor_skipgram_frequency': skipgram_sums['half_scissor'] / trigram_total,
+                'lateral_stretch_skipgram_frequency': skipgram_sums['lateral_stretch'] / trigram_total,
+                'alternate_frequency': pattern_sums['alternate'] / trigram_total,
+                'roll_frequency': pattern_sums['roll'] / trigram_total,
+                'onehand_frequency': pattern_sums['onehand'] / trigram_total,
+                'redirect_frequency': pattern_sums['redirect'] / trigram_total,
+                'finger_usage_frequency': np.stack([
+                    np.where(fingers == finger, key_usages, 0).sum(axis=2)
+                    for finger in range(10)
+                ], axis=2) / usage[:, :, None],
+                'row_usage_frequency': np.stack([
+                    np.where(rows == row, key_usages, 0).sum(axis=2)
+                    for row in range(len(Keyboard.Row))
+                ], axis=2) / usage[:, :, None],
+            }
+
+    def grid(self, corpora: list[Corpus]) -> dict[str, np.ndarray]:
+        """Calculate metrics of all corpora, keyboards and layouts."""
+        if not corpora:
+            raise ValueError('No corpora to evaluate')
+
+        metrics = [self.evaluate(corpus) for corpus in corpora]
+
+        return {
+            name: np.stack([corpus_metrics[name] for corpus_metrics in metrics])
+            for name in metrics[0]
+        }
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib
+import shutil
+import sqlite3
+import time
+import uuid
+from typing import Callable
+
+import pandas as pd
+
+
+class Exporter():
+    """Export of rows to local Parquet dataset or SQLite database.
+
+    Used instead of `Uploader` when there is no backend, rows
+    have names of keyboards, layouts and corpora instead of ids.
+    Rows are written by batches and appended to exported ones,
+    row with same key fields replaces previous one. Files are
+    stored once by hash of their content.
+    """
+
+    def __init__(self, path, table: str, key_fields: tuple[str, ...], file_field: str | None = None, batch_size: int = 256):
+        """Open export by path, format is chosen by its suffix."""
+        self.path = pathlib.Path(path)
+        self.table = table
+        self.key_fields = key_fields
+        self.file_field = file_field
+        self.batch_size = batch_size
+
+        if self.path.suffix == '.parquet':
+            try:
+                pd.io.parquet.get_engine('auto')
+            except ImportError as error:
+                raise ImportError(
+                    'Parquet export requires pyarrow, install it or export to .sqlite file'
+                ) from error
+        elif self.path.suffix not in ('.sqlite', '.db'):
+            raise ValueError(f'Unknown export format: {self.path.suffix}')
+
+        # Files are named by hash of content in folder next to export
+        self.files_path = self.path.with_name(f'{self.path.stem}_files')
+
+        self._batch: list[tuple[dict, Callable | None]] = []
+        self._keys = self._exported_keys()
+
+        self.created = 0
+        self.updated = 0
+        self.errors: list[tuple[dict, Exception]] = []
+
+    def resource_id(self, resource: str, search: str) -> str:
+        """Return name of keyboard, layout or corpus, used instead of id."""
+        return search
+
+    def _key(self, row: dict) -> tuple:
+        """Return values of key fields of row."""
+        return tuple(row[field] for field in self.key_fields)
+
+    def _exported_keys(self) -> set[tuple]:
+        """Return key fields of already exported rows."""
+        if self.path.suffix == '.parquet':
+            if not self.path.is_dir():
+                return set()
+
+            keys = pd.read_parquet(self.path, columns=list(self.key_fields))
+        else:
+            if not self.path.is_file():
+                return set()
+
+            connection = sqlite3.connect(self.path)
+            try:
+                if not self._has_table(connection):
+                    return set()
+
+                keys = pd.read_sql(
+                    f'SELECT {", ".join(self.key_fields)} FROM "{self.table}"', connection
+                )
+            finally:
+                connection.close()
+
+        return set(keys.itertuples(index=False, name=None))
+
+    def _has_table(self, connection: sqlite3.Connection) -> bool:
+        """Check if table exists in database."""
+        return connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)
+        ).fetchone() is not None
+
+    def store_file(self, file_path) -> str:
+        """Copy file to export by hash of its content, unless it's stored.
+
+        Return path of stored file relative to export.
+        """
+        file_path = pathlib.Path(file_path)
+        digest = hashlib.sha256(file_path.read_bytes()).hexdigest()
+        stored_path = self.files_path / f'{digest}{file_path.suffix}'
+
+        if not stored_path.is_file():
+            self.files_path.mkdir(parents=True, exist_ok=True)
+
+            # Concurrent exports may store same file
+            temporary_path = stored_path.with_name(f'.{stored_path.name}.{uuid.uuid4().hex}.tmp')
+            shutil.copyfile(file_path, temporary_path)
+            os.replace(temporary_path, stored_path)
+
+        return stored_path.relative_to(self.path.parent).as_posix()
+
+    def _write_parquet(self, rows: pd.DataFrame):
+        """Append rows as new part of Parquet dataset.
+
+        Parts are named by time of writing and random suffix, so
+        concurrent exports never replace parts of each other, and
+        sorted names keep order of writing.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        name = f'part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet'
+
+        # Files starting with dot are not read as parts of dataset
+        temporary_path = self.path / f'.{name}.tmp'
+        rows.to_parquet(temporary_path, index=False)
+        os.replace(temporary_path, self.path / name)
+
+    def _write_sqlite(self, rows: pd.DataFrame, replaced: list[tuple]):
+        """Replace rows with same keys and append new ones in one transaction."""
+        with sqlite3.connect(self.path) as connection:
+            if replaced and self._has_table(connection):
+                conditions = ' AND '.join(f'{field} = ?' for field in self.key_fields)
+                connection.executemany(f'DELETE FROM "{self.table}" WHERE {conditions}', replaced)
+
+            rows.to_sql(self.table, connection, if_exists='append', index=False)
+
+        connection.close()
+
+    def flush(self):
+        """Write collected rows to export."""
+        if not self._batch:
+            return
+
+        batch, self._batch = self._batch, []
+        rows = [row for row, _ in batch]
+
+        try:
+            replaced = [self._key(row) for row in rows if self._key(row) in self._keys]
+
+            if self.path.suffix == '.parquet':
+                self._write_parquet(pd.DataFrame(rows))
+            else:
+                self._write_sqlite(pd.DataFrame(rows), replaced)
+        except (OSError, ValueError, sqlite3.Error) as error:
+            self.errors.extend((row, error) for row in rows)
+            return
+
+        self._keys.update(self._key(row) for row in rows)
+        self.created += len(rows) - len(replaced)
+        self.updated += len(replaced)
+
+        for _, done in batch:
+            if done is not None:
+                done()
+
+    def submit(self, row: dict, file_path: str | None = None, done: Callable | None = None):
+        """Add row with its file to batch, full batch is written.
+
+        Optional `done` is called once row is written.
+        """
+        if file_path is not None:
+            row = row | {self.file_field: self.store_file(file_path)}
+
+        self._batch.append((row, done))
+
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def close(self):
+        """Write rest of rows.
+
+        Parts of Parquet dataset are joined in one, so rows
+        replaced by later parts are dropped.
+        """
+        self.flush()
+
+        parts = sorted(self.path.glob('part-*.parquet')) if self.path.suffix == '.parquet' else []
+        if len(parts) > 1:
+            rows = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+            rows = rows.drop_duplicates(list(self.key_fields), keep='last')
+
+            temporary_path = self.path / f'.{parts[0].name}.{uuid.uuid4().hex}.tmp'
+            rows.to_parquet(temporary_path, index=False)
+
+            # First part is replaced at once, so rows are never lost
+            os.replace(temporary_path, parts[0])
+            for part in parts[1:]:
+                part.unlink(missing_ok=True)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from internal.key import Key
 from internal.keyboard import Keyboard
 from math import hypot
@@ -8,6 +10,8 @@ class Finger:
     Used in travel distance evaluation.
     """
 
+    __slots__ = ('index', 'x', 'y', 'travel_distance')
+
     def __init__(self, index: Keyboard.Finger, x: int = 0, y: int = 0) -> None:
         """Initialize finger."""
         self.index = index
@@ -28,6 +32,19 @@ class Finger:
         self.x = cx
         self.y = cy
 
+    def move_through(self, start: np.ndarray, end: np.ndarray, distance: float) -> None:
+        """Move finger to start of path, then through path to its end.
+
+        Path is given by start and end points and its length.
+        """
+        self.travel_distance += hypot(
+            start[0] - self.x,
+            start[1] - self.y
+        ) + distance
+
+        self.x = float(end[0])
+        self.y = float(end[1])
+
     def __repr__(self) -> str:
         """Display finger position."""
         return f'({self.x}, {self.y})'
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+from internal.cache import LRUCache
+from internal.models import model_digest
+
+# Number of cached geometries and overlays of each geometry
+GEOMETRY_CACHE_SIZE = 16
+OVERLAY_CACHE_SIZE = 256
+
+# Geometries by hash of keyboard model content
+_geometries = LRUCache(GEOMETRY_CACHE_SIZE)
+
+
+class KeyShape(NamedTuple):
+    """Physical properties of key."""
+    code: str
+    x: int
+    y: int
+    w: int
+    h: int
+    row: str
+    finger: int
+    is_home: bool
+
+    # Notch params for curve enter key
+    notch: bool
+    notch_place: str | None
+    notch_w: int
+    notch_h: int
+
+    @classmethod
+    def from_data(self, key_code: str, key_data: dict) -> KeyShape:
+        """Create shape of key by given code and key data."""
+        notch = key_data.get('notch', False)
+
+        return KeyShape(
+            code=key_code,
+            x=key_data.get('x', 0),
+            y=key_data.get('y', 0),
+            w=key_data.get('w', 40),
+            h=key_data.get('h', 40),
+            row=key_data.get('row', 'A'),
+            finger=key_data.get('finger', 1),
+            is_home=key_data.get('is_home', False),
+            notch=bool(notch),
+            notch_place=notch.get('place') if notch else None,
+            notch_w=notch.get('w', 40) if notch else 40,
+            notch_h=notch.get('h', 40) if notch else 40,
+        )
+
+
+class Overlay(NamedTuple):
+    """Layout mapped on keys of geometry."""
+    key_layouts: tuple[dict, ...]
+    mapping_to_index: dict[str, int]
+    dublicates: frozenset[str]
+
+
+class Geometry():
+    """Physical keys of keyboard, shared by all layouts on it.
+
+    Keys are indexed in order of keyboard model. Arrays of key
+    features and key pair matrices are read-only, as geometry
+    is shared by every keyboard built by same model.
+    """
+
+    def __init__(self, keyboard_model: dict):
+        """Build arrays of keys and key pairs features."""
+        # Keyboard module imports geometry
+        from internal.keyboard import Keyboard
+
+        self.name = keyboard_model['name']
+        self.file = keyboard_model['file']
+        self.one_unit: int = keyboard_model['one_unit']
+
+        self.shapes = tuple(
+            KeyShape.from_data(key_code, key_data)
+            for key_code, key_data in keyboard_model.get('keyboard').items()
+        )
+        self.indexes = {shape.code: i for i, shape in enumerate(self.shapes)}
+
+        x = np.array([shape.x for shape in self.shapes], dtype=float)
+        y = np.array([shape.y for shape in self.shapes], dtype=float)
+        w = np.array([shape.w for shape in self.shapes], dtype=float)
+        h = np.array([shape.h for shape in self.shapes], dtype=float)
+        fingers = np.array([shape.finger for shape in self.shapes], dtype=int)
+        order = np.array([Keyboard.FINGER_ORDER[finger] for finger in fingers.tolist()], dtype=int)
+        hands = fingers < 6
+
+        self.x = x
+        self.y = y
+        self.centers = np.stack((x + w / 2, y + h / 2), axis=1).reshape(-1, 2)
+        self.fingers = fingers
+        self.rows = tuple(shape.row for shape in self.shapes)
+        self.is_home = np.array([shape.is_home for shape in self.shapes], dtype=bool)
+
+        # Distances between key centers in pixels
+        self.distances = np.hypot(
+            self.centers[:, None, 0] - self.centers[None, :, 0],
+            self.centers[:, None, 1] - self.centers[None, :, 1],
+        )
+
+        self.same_finger = fingers[:, None] == fingers[None, :]
+        self.same_hand = hands[:, None] == hands[None, :]
+        self.directions = fingers[:, None] > fingers[None, :]
+
+        # Scissors, vertical separation of keys on one hand
+        vertical = np.abs(y[:, None] - y[None, :]) / self.one_unit
+        is_top_first = order[:, None] <= order[None, :]
+        top_y = np.where(is_top_first, y[:, None], y[None, :])
+        bottom_y = np.where(is_top_first, y[None, :], y[:, None])
+        is_scissor = self.same_hand & ~self.same_finger & (top_y >= bottom_y)
+
+        self.scissors = np.full(self.same_finger.shape, Keyboard.Scissor.NONE, dtype=np.int8)
+        self.scissors[is_scissor & (vertical >= 1)] = Keyboard.Scissor.HALF
+        self.scissors[is_scissor & (vertical >= 2)] = Keyboard.Scissor.FULL
+
+        # Lateral stretches, horisontal separation of adjasent fingers
+        finger_distance = fingers[:, None] - fingers[None, :]
+        horisontal = np.abs(x[:, None] - x[None, :]) / self.one_unit
+        self.lateral_stretches = self.same_hand & (
+            ((finger_distance == 1) & (horisontal >= 2))
+            | ((finger_distance == 2) & (horisontal >= 3.5))
+        )
+
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+        # Overlays by hash of layout model content
+        self._overlays = LRUCache(OVERLAY_CACHE_SIZE)
+
+    @classmethod
+    def from_model(self, keyboard_model: dict) -> Geometry:
+        """Return geometry of keyboard model, built once for same content.
+
+        Only recently used geometries are kept, models are not.
+        """
+        key = model_digest(keyboard_model)
+
+        geometry = _geometries.get(key)
+        if geometry is None:
+            geometry = Geometry(keyboard_model)
+            _geometries.put(key, geometry)
+
+        return geometry
+
+    def overlay(self, layout_model: dict) -> Overlay:
+        """Return layout model mapped on keys, built once for same content.
+
+        Overlay is shared by all keyboards with same layout,
+        so it must not be changed.
+        """
+        key = model_digest(layout_model)
+
+        overlay = self._overlays.get(key)
+        if overlay is not None:
+            return overlay
+
+        layouts: dict = layout_model.get('layout')
+        key_layouts = tuple(layouts.get(shape.code, {}) for shape in self.shapes)
+
+        mapping_to_index = {}
+        for index, key_layout in enumerate(key_layouts):
+            for char in key_layout.get('mappings', {}).values():
+                mapping_to_index[char] = index
+
+        # Modifiers may repeat mappings of other keys
+        chars = set()
+        dublicates = set()
+        for key_layout in key_layouts:
+            if key_layout.get('is_modifier', False):
+                continue
+
+            for mapping in key_layout.get('mappings', {}).values():
+                if mapping in chars:
+                    dublicates.add(mapping)
+                chars.add(mapping)
+
+        overlay = Overlay(key_layouts, mapping_to_index, frozenset(dublicates))
+        self._overlays.put(key, overlay)
+
+        return overlay
+
+    def release(self, layout_model: dict):
+        """Drop cached overlay of layout model, that won't be used again."""
+        self._overlays.pop(model_digest(layout_model))
+
+    def __len__(self) -> int:
+        """Return number of keys."""
+        return len(self.shapes)
@@ -1,7 +1,19 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+
+import numpy as np
+
 from internal.finger import Finger
 from internal.key import Key
 from internal.keyboard import Keyboard
-from internal.corpus import Corpus
+from internal.corpus import CHUNK_SIZE, Corpus
+
+# Keyboards and corpus of worker process
+_worker_state = {}
 
 
 class Hands:
@@ -10,6 +22,8 @@ class Hands:
     Used in evaluation of finger travel distance.
     """
 
+    __slots__ = ('_fingers',)
+
     def __init__(self, keyboard: Keyboard) -> None:
         """Initialize hands on keyboard."""
         # 1 - left pinky
@@ -66,18 +80,129 @@ class Hands:
         """Move finger to selected key."""
         return self._fingers[finger].move_to(key)
 
-    def simulate_typing(self, keyboard: Keyboard, corpus: Corpus, progress: bool = True) -> None:
-        """Calculates travel distance by typing emulation."""
-        one_percent = corpus.length // 100 - 1
-
-        for i, char in enumerate(corpus.text):
-            key = keyboard.mapping_to_key(char)
-
-            if key: 
-                self.move_to(key.finger, key)
+    @staticmethod
+    def _paths(keyboard: Keyboard, keys: np.ndarray) -> list[tuple[int, int, int, float]]:
+        """Split typed keys by fingers into paths.
+
+        Return finger, first and last key indexes and path length
+        between them for each finger used in text.
+        """
+        keys = keys[keys >= 0]
+
+        # Group presses by finger, keeping order of presses
+        fingers = keyboard.key_fingers[keys]
+        order = np.argsort(fingers, kind='stable')
+        bounds = np.cumsum(np.bincount(fingers, minlength=11))
+
+        paths = []
+        for finger in Keyboard.Finger:
+            presses = keys[order[bounds[finger - 1]:bounds[finger]]]
+            if not len(presses):
+                continue
+
+            x = keyboard.centers[presses, 0]
+            y = keyboard.centers[presses, 1]
+            distance = float(np.hypot(np.diff(x), np.diff(y)).sum())
+
+            paths.append((finger, presses[0], presses[-1], distance))
+
+        return paths
+
+    @staticmethod
+    def _chunk_paths(keyboards: list[Keyboard], corpus: Corpus, chunk: tuple[int, int, int]) -> list[list]:
+        """Return finger paths of corpus chunk for each keyboard.
+
+        Chunk is read and encoded by corpus alphabet once,
+        then mapped to keys of each layout by lookup array.
+        """
+        codes = corpus.counts.lookup(corpus.range_points(chunk))
+
+        return [
+            Hands._paths(keyboard, keyboard.codes_to_keys(codes))
+            for keyboard in keyboards
+        ]
+
+    @staticmethod
+    def _init_worker(keyboards: list[Keyboard], corpus: Corpus):
+        """Keep keyboards and corpus in worker process."""
+        _worker_state['keyboards'] = keyboards
+        _worker_state['corpus'] = corpus
+
+    @staticmethod
+    def _worker_chunk_paths(chunk: tuple[int, int, int]) -> list[list]:
+        """Return finger paths of corpus chunk in worker process."""
+        return Hands._chunk_paths(
+            _worker_state['keyboards'], _worker_state['corpus'], chunk
+        )
 
-            if progress and i % one_percent == 0:
-                print(f'\rProgress: {i/corpus.length:.0%} ', end='')
+    @staticmethod
+    def _move_through(hands: list[Hands], keyboards: list[Keyboard], chunk_paths: Iterable, chunks: int, progress: bool):
+        """Move hands of each keyboard through finger paths of chunks in their order."""
+        for i, keyboards_paths in enumerate(chunk_paths, 1):
+            for keyboard, keyboard_hands, paths in zip(keyboards, hands, keyboards_paths):
+                for finger, first, last, distance in paths:
+                    keyboard_hands.fingers[finger].move_through(
+                        keyboard.centers[first],
+                        keyboard.centers[last],
+                        distance
+                    )
+
+            if progress:
+                print(f'\rProgress: {i/chunks:.0%} ', end='')
+
+    @staticmethod
+    def _simulate(hands: list[Hands], keyboards: list[Keyboard], corpus: Corpus, progress: bool, workers: int, chunk_size: int):
+        """Move hands of each keyboard through finger paths of corpus chunks."""
+        chunks = corpus.ranges(chunk_size)
+        workers = workers or os.cpu_count()
+
+        # Prepare lookups once, so forked workers share them
+        corpus.counts.lookup(np.zeros(0, dtype=np.uint32))
+        for keyboard in keyboards:
+            keyboard.codes_to_keys(np.zeros(0, dtype=np.int64))
+
+        # Workers are forked to share keyboards and corpus with them
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=Hands._init_worker,
+                initargs=(keyboards, corpus),
+            ) as executor:
+                chunk_paths = executor.map(Hands._worker_chunk_paths, chunks)
+                Hands._move_through(hands, keyboards, chunk_paths, len(chunks), progress)
+        else:
+            chunk_paths = (
+                Hands._chunk_paths(keyboards, corpus, chunk)
+                for chunk in chunks
+            )
+            Hands._move_through(hands, keyboards, chunk_paths, len(chunks), progress)
 
         if progress:
             print('\n')
+
+    def simulate_typing(self, keyboard: Keyboard, corpus: Corpus, progress: bool = True, workers: int = 1, chunk_size: int = CHUNK_SIZE) -> None:
+        """Calculates travel distance by typing emulation.
+
+        Text is mapped to key indexes by chunks, then pressed keys
+        are split by fingers into paths. Each finger moves from its
+        position to start of its path in chunk, then through path.
+
+        Chunks are independent, so several `workers` can find paths
+        in parallel, result is the same as for one worker.
+        Zero workers means one worker per CPU core.
+        """
+        Hands._simulate([self], [keyboard], corpus, progress, workers, chunk_size)
+
+    @staticmethod
+    def simulate_typing_batch(keyboards: list[Keyboard], corpus: Corpus, progress: bool = True, workers: int = 1, chunk_size: int = CHUNK_SIZE) -> list[Hands]:
+        """Calculates travel distance for many layouts by one corpus pass.
+
+        All keyboards must share same corpus. Each chunk of text is
+        read and encoded once, then typed by hands of every keyboard.
+        Return hands of keyboards in same order.
+        """
+        hands = [Hands(keyboard) for keyboard in keyboards]
+        Hands._simulate(hands, keyboards, corpus, progress, workers, chunk_size)
+
+        return hands
@@ -4,43 +4,88 @@ from math import hypot
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from internal.geometry import KeyShape
     from internal.keyboard import Keyboard
 
 class Key():
     """Model of keyboard key.
 
-    Contains physical information and layout one.
+    Contains physical information and layout one. Physical
+    properties are taken from geometry shared by layouts,
+    layout ones from layout overlay of keyboard.
     """
 
-    def __init__(self, keyboard: Keyboard, key_code: str, key_data: dict, key_layout: dict):
-        """Create key by given code, key data and layout data."""
+    # Keys are created for every keyboard, so they carry no dict
+    __slots__ = ('keyboard', 'index', 'shape')
+
+    def __init__(self, keyboard: Keyboard, index: int):
+        """Create key by its index on keyboard."""
         self.keyboard: Keyboard = keyboard
-        self.key: str = key_code
-
-        # Physical key properties
-        self.x: int = key_data.get('x', 0)
-        self.y: int = key_data.get("y", 0)
-        self.w: int = key_data.get('w', 40)
-        self.h: int = key_data.get('h', 40)
-        self.row: Keyboard.Row = key_data.get('row', 'A')
-        self.finger: Keyboard.Finger = key_data.get('finger', 1)
-        self.hand: Keyboard.Hand = 'left' if self.finger < 6 else 'right'
-        self.is_home: bool = key_data.get('is_home', False)
-
-        # Notch params for curve enter key
-        notch = key_data.get('notch', False)
-
-        if notch:
-            self.notch = True
-            self.notch_place = notch.get('place')
-            self.notch_w = notch.get('w', 40)
-            self.notch_h = notch.get('h', 40)
-        else:
-            self.notch = False
-
-        # Layout properties
-        self.mappings: dict = key_layout.get('mappings', {})
-        self.is_modifier: bool = key_layout.get('is_modifier', False)
+        self.index: int = index
+        self.shape: KeyShape = keyboard.geometry.shapes[index]
+
+    # Physical key properties
+    @property
+    def key(self) -> str:
+        return self.shape.code
+
+    @property
+    def x(self) -> int:
+        return self.shape.x
+
+    @property
+    def y(self) -> int:
+        return self.shape.y
+
+    @property
+    def w(self) -> int:
+        return self.shape.w
+
+    @property
+    def h(self) -> int:
+        return self.shape.h
+
+    @property
+    def row(self) -> Keyboard.Row:
+        return self.shape.row
+
+    @property
+    def finger(self) -> Keyboard.Finger:
+        return self.shape.finger
+
+    @property
+    def hand(self) -> Keyboard.Hand:
+        return 'left' if self.shape.finger < 6 else 'right'
+
+    @property
+    def is_home(self) -> bool:
+        return self.shape.is_home
+
+    # Notch params for curve enter key
+    @property
+    def notch(self) -> bool:
+        return self.shape.notch
+
+    @property
+    def notch_place(self) -> str | None:
+        return self.shape.notch_place
+
+    @property
+    def notch_w(self) -> int:
+        return self.shape.notch_w
+
+    @property
+    def notch_h(self) -> int:
+        return self.shape.notch_h
+
+    # Layout properties
+    @property
+    def mappings(self) -> dict:
+        return self.keyboard.key_layout(self.index).get('mappings', {})
+
+    @property
+    def is_modifier(self) -> bool:
+        return self.keyboard.key_layout(self.index).get('is_modifier', False)
 
     def __repr__(self) -> str:
         """Display key physical features: x, y finger and row."""
@@ -61,17 +106,19 @@ class Key():
         if self.is_modifier:
             return 0
 
+        # Fallback on bottom layers as mapping does
+        layers = self.keyboard.usage_table['layers'][self.key]
+        for bottom_layer in range(layer, 0, -1):
+            if bottom_layer in layers:
+                return layers[bottom_layer]
+
         mapping = self.mapping(layer)
         return self.keyboard.corpus.char_usage(mapping)
 
     @property
     def usage(self) -> int:
         """Returns key total usage by all layers."""
-        usage = 0
-        for layer in self.mappings.keys():
-            usage += self.layer_usage(layer)
-
-        return usage
+        return self.keyboard.usage_table['keys'][self.key]
 
     def layer_frequency(self, layer: int) -> float:
         """Return key mapping usage by selected layer."""
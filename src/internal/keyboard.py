@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 from enum import IntEnum, StrEnum
-from functools import cached_property
-from collections import Counter
-
-from yaml import safe_load
+from functools import cache, cached_property
 
+import numpy as np
 from internal.corpus import Corpus
+from internal.geometry import Geometry
 from internal.key import Key
+from internal.models import load_model
 
 
 class Keyboard():
@@ -43,11 +43,34 @@ class Keyboard():
         LEFT = 'left'
         RIGHT = 'right'
 
+    class Scissor(IntEnum):
+        """Enumeration for scissor class of key pair."""
+        NONE = 0
+        HALF = 1
+        FULL = 2
+
+    # Lower index means the higher must be finger
+    FINGER_ORDER = {
+        Finger.RIGHT_MIDDLE: 0, 
+        Finger.RIGHT_RING: 1,
+        Finger.RIGHT_PINKY: 2,
+        Finger.RIGHT_INDEX: 3,
+        Finger.RIGHT_THUMB: 4,
+
+        Finger.LEFT_MIDDLE: 0,
+        Finger.LEFT_RING: 1,
+        Finger.LEFT_PINKY: 2,
+        Finger.LEFT_INDEX: 3,
+        Finger.LEFT_THUMB: 4,
+    }
+
     def __init__(self, keyboard_model: dict, layout_model: dict, corpus: Corpus):
         """Init keyboard. Uses corpus to calculate usages."""
         self.corpus = corpus
 
-        self.one_unit: int = keyboard_model['one_unit']
+        # Physical keys are shared by all layouts on keyboard
+        self.geometry = Geometry.from_model(keyboard_model)
+        self.one_unit: int = self.geometry.one_unit
 
         self.name = keyboard_model['name']
         self.file = keyboard_model['file']
@@ -55,45 +78,87 @@ class Keyboard():
         self.layout_name = layout_model['name']
         self.layout_file = layout_model['file']
 
-        self._code_to_key: dict[str, Key] = {}
-        self._mapping_to_key: dict[str, Key] = {}
-
-        keys: dict = keyboard_model.get('keyboard')
-        layouts: dict = layout_model.get('layout')
+        # Layout of each key by key index, shared until keys are swapped
+        overlay = self.geometry.overlay(layout_model)
+        self._key_layouts: tuple[dict, ...] | list[dict] = overlay.key_layouts
+        self._mapping_to_index: dict[str, int] = overlay.mapping_to_index
+        self._dublicates = overlay.dublicates
 
-        for key_code, key_data in keys.items():
-            key_layout = layouts.get(key_code, {})
-            key_chars = key_layout.get("mappings", {}).values()
-
-            key = Key(self, key_code, key_data, key_layout)
-
-            # Map by code and chars on layout
-            self._code_to_key[key_code] = key
-            for char in key_chars:
-                self._mapping_to_key[char] = key
+        # Keys are created on first use
+        self._keys: list[Key] | None = None
 
         self.check_dublicate_mappings()
 
+        # Features of keys and key pairs, indexed by key index
+        self.centers = self.geometry.centers
+        self.key_fingers = self.geometry.fingers
+        self.distances = self.geometry.distances
+        self.same_finger = self.geometry.same_finger
+        self.same_hand = self.geometry.same_hand
+        self.directions = self.geometry.directions
+        self.scissors = self.geometry.scissors
+        self.lateral_stretches = self.geometry.lateral_stretches
+
+    @staticmethod
+    @cache
+    def finger_patterns() -> dict[str, np.ndarray]:
+        """Return masks of trigram patterns by fingers.
+
+        Masks are indexed by fingers of trigram keys,
+        starting from zero for left pinky.
+        """
+        finger = np.arange(1, 11)
+        a = finger[:, None, None]
+        b = finger[None, :, None]
+        c = finger[None, None, :]
+        ha, hb, hc = a < 6, b < 6, c < 6
+
+        shdf = (ha == hb) & (hb == hc) & (a != b) & (b != c) & (a != c)
+        same_direction = (a > b) == (b > c)
+
+        return {
+            'alternate': (ha == hc) & (ha != hb),
+            'roll': (
+                ((ha == hb) & (a != b) & (ha != hc))
+                | ((hb == hc) & (b != c) & (hb != ha))
+            ),
+            'onehand': shdf & same_direction,
+            'redirect': shdf & ~same_direction,
+        }
+
     @classmethod
     def load(self, keyboard_model_path, layout_model_path, corpus: Corpus):
         """Load keyboard from YAML models."""
-        keyboard_model: dict = safe_load(
-            open(keyboard_model_path, encoding="utf-8").read()
-        )
-        layout_model: dict = safe_load(
-            open(layout_model_path, encoding="utf-8").read()
-        )
+        keyboard_model = load_model(keyboard_model_path)
+        layout_model = load_model(layout_model_path)
 
         return Keyboard(keyboard_model, layout_model, corpus)
 
     def mapping_to_key(self, mapping: str) -> Key | None:
         """Return None or key that contain selected mapping."""
-        return self._mapping_to_key.get(mapping)
+        index = self._mapping_to_index.get(mapping)
+        return None if index is None else self._key(index)
+
+    def code_to_key(self, key_code: str) -> Key | None:
+        """Return None or key with selected key code."""
+        index = self.geometry.indexes.get(key_code)
+        return None if index is None else self._key(index)
+
+    def key_layout(self, index: int) -> dict:
+        """Return layout data of key by its index."""
+        return self._key_layouts[index]
+
+    def _key(self, index: int) -> Key:
+        """Return key by its index, creating keys on first use."""
+        if self._keys is None:
+            self._keys = [Key(self, i) for i in range(len(self.geometry))]
+
+        return self._keys[index]
 
     @property
     def keys(self) -> list[Key]:
         """Return list of keys on keyboard."""
-        return list(self._code_to_key.values())
+        return [self._key(index) for index in range(len(self.geometry))]
 
     @property
     def keys_is_home(self) -> list[Key]:
@@ -110,20 +175,7 @@ class Keyboard():
 
     def check_dublicate_mappings(self):
         """Checks if there's dublicated of mapping on keyboard."""
-        dublicates = set()
-        chars = set()
-
-        for key in self.keys:
-            if key.is_modifier:
-                continue
-
-            for mapping in key.mappings.values():
-                if mapping not in chars:
-                    chars.add(mapping)
-                else:
-                    dublicates.add(mapping)
-
-        for dublicate in dublicates:
+        for dublicate in self._dublicates:
             print(f'Warning: mapping "{dublicate}" repeats on layout')
 
     def keyboard_usage(self):
@@ -156,30 +208,81 @@ class Keyboard():
 
         return hands_frequency.format_map(format_map)
 
+    @property
+    def corpus(self) -> Corpus:
+        """Return corpus used to calculate usages and metrics."""
+        return self._corpus
+
+    @corpus.setter
+    def corpus(self, corpus: Corpus):
+        """Replace corpus, dropping all values calculated by previous one."""
+        self._corpus = corpus
+        self._drop_cache()
+
+    def _drop_cache(self):
+        """Drops cached values. If a field doesn't exist, it's skipped."""
+        for attr, value in vars(Keyboard).items():
+            if isinstance(value, cached_property):
+                self.__dict__.pop(attr, None)
+
     @cached_property
+    def _usage_table(self) -> dict:
+        """Build table of usages in single pass over keys."""
+        table = {
+            'corpus_version': self.corpus.version,
+            'keys': {},
+            'layers': {},
+            'fingers': dict.fromkeys(Keyboard.Finger, 0),
+            'rows': dict.fromkeys(Keyboard.Row, 0),
+            'hands': dict.fromkeys(Keyboard.Hand, 0),
+        }
+
+        for key in self.keys:
+            layers = {}
+
+            for layer, mapping in key.mappings.items():
+                if key.is_modifier:
+                    layers[layer] = 0
+                else:
+                    layers[layer] = self.corpus.char_usage(mapping)
+
+            usage = sum(layers.values())
+
+            table['layers'][key.key] = layers
+            table['keys'][key.key] = usage
+            table['fingers'][key.finger] = table['fingers'].get(key.finger, 0) + usage
+            table['rows'][key.row] = table['rows'].get(key.row, 0) + usage
+            table['hands'][key.hand] += usage
+
+        table['total'] = sum(table['keys'].values())
+        table['max'] = max(table['keys'].values(), default=0)
+
+        return table
+
+    @property
+    def usage_table(self) -> dict:
+        """Return table of usages by keys, layers, fingers, rows and hands.
+
+        Table is rebuilt if corpus text was changed since last build.
+        """
+        if self._usage_table['corpus_version'] != self.corpus.version:
+            self._drop_cache()
+
+        return self._usage_table
+
+    @property
     def key_max_usage(self) -> int:
         """Finds key, that used rather than all other ones."""
-        self._key_max_usage = max(key.usage for key in self.keys)
-        return self._key_max_usage
+        return self.usage_table['max']
 
-    @cached_property
+    @property
     def usage(self) -> int:
         """Calculates total keyboard usage."""
-        self._usage = 0
-        for key in self.keys:
-            self._usage += key.usage
-
-        return self._usage
+        return self.usage_table['total']
 
     def finger_usage(self, finger: Finger):
         """Calculates finger usage by mappings."""
-        usage = 0
-
-        for key in self.keys:
-            if key.finger == finger:
-                usage += key.usage
-
-        return usage
+        return self.usage_table['fingers'].get(finger, 0)
 
     def finger_usage_frequency(self, finger: Finger) -> float:
         """Return finger usage float value."""
@@ -187,16 +290,7 @@ class Keyboard():
 
     def hand_usage(self, hand: Hand) -> int:
         """Calculate hand usage by it's fingers."""
-        usage = 0
-
-        for finger in range(1, 11):
-            if hand == 'left' and finger <= 5:
-                usage += self.finger_usage(finger)
-
-            elif hand == 'right' and finger > 5:
-                usage += self.finger_usage(finger)
-
-        return usage
+        return self.usage_table['hands'].get(hand, 0)
 
     def hand_usage_frequency(self, hand: Hand) -> float:
         """Return hand usage float value."""
@@ -204,13 +298,7 @@ class Keyboard():
 
     def row_usage(self, row: Row) -> int:
         """Return row usage by keys."""
-        usage = 0
-
-        for key in self.keys:
-            if key.row == row:
-                usage += key.usage
-
-        return usage
+        return self.usage_table['rows'].get(row, 0)
 
     def row_usage_frequency(self, row: Row) -> float:
         """Return selected row usage frequency."""
@@ -230,23 +318,113 @@ class Keyboard():
         return mappings
 
     @cached_property
-    def bigram_mean_distance(self) -> float:
-        """Return mean distance between bigram keys."""
-        bigrams = self.corpus.bigrams
+    def char_indexes(self) -> np.ndarray:
+        """Return key index for each corpus alphabet char, -1 if not mapped."""
+        return np.array([
+            self._mapping_to_index.get(char, -1)
+            for char in self.corpus.alphabet
+        ], dtype=np.int64)
 
-        total_distance = 0
-        total_weight = 0
+    @cached_property
+    def _alphabet_to_key(self) -> np.ndarray:
+        """Return key indexes by corpus alphabet indexes, -1 is not mapped."""
+        return np.append(self.char_indexes, -1)
+
+    def codes_to_keys(self, codes: np.ndarray) -> np.ndarray:
+        """Map text encoded by corpus alphabet to key indexes.
 
-        for bigram, weight in bigrams.items():
-            left_key = self.mapping_to_key(bigram[0])
-            right_key = self.mapping_to_key(bigram[-1])
+        Codes and keys that are not found are marked as -1.
+        """
+        return self._alphabet_to_key[codes]
 
-            distance = left_key.distance_to(right_key) * weight
+    @cached_property
+    def key_counts(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return unigram, bigram and trigram counts by key indexes.
 
-            total_distance += distance
-            total_weight += weight
+        Corpus counts are projected on keys of layout in one step,
+        characters that are not mapped on keys are dropped.
+        """
+        return self.corpus.counts.project(self.char_indexes, len(self.geometry))
 
-        return total_distance / total_weight / self.one_unit
+    @cached_property
+    def _repeats(self) -> tuple[int, int]:
+        """Return usages of same characters bigrams and 1-skipgrams.
+
+        N-grams of same characters are not same-finger ones.
+        They depend only on mapped characters, not on their keys.
+        """
+        mapped = self.char_indexes >= 0
+        bigrams = np.diagonal(self.corpus.bigram_counts)[mapped].sum()
+        skipgrams = np.diagonal(self.corpus.skipgram_counts)[mapped].sum()
+
+        return bigrams, skipgrams
+
+    @cached_property
+    def _key_bigrams(self) -> np.ndarray:
+        """Return key pair counts of bigrams."""
+        _, bigrams, _ = self.key_counts
+
+        return bigrams
+
+    def _pair_sums(self, first: np.ndarray, second: np.ndarray, usages: np.ndarray) -> dict[str, float]:
+        """Return usages of key pairs summed by features of pairs."""
+        same_finger = self.same_finger[first, second]
+        scissors = self.scissors[first, second]
+        distances = usages * self.distances[first, second]
+
+        return {
+            'usage': usages.sum(),
+            'distance': distances.sum(),
+            'same_finger': usages[same_finger].sum(),
+            'same_finger_distance': distances[same_finger].sum(),
+            'full_scissor': usages[scissors == Keyboard.Scissor.FULL].sum(),
+            'half_scissor': usages[scissors == Keyboard.Scissor.HALF].sum(),
+            'lateral_stretch': usages[self.lateral_stretches[first, second]].sum(),
+        }
+
+    @staticmethod
+    def _pattern_sums(first: np.ndarray, second: np.ndarray, third: np.ndarray, usages: np.ndarray) -> dict[str, float]:
+        """Return usages of finger triples summed by trigram patterns."""
+        return {
+            name: usages[mask[first, second, third]].sum()
+            for name, mask in Keyboard.finger_patterns().items()
+        }
+
+    @cached_property
+    def _bigram_sums(self) -> dict[str, float]:
+        """Return usages of key bigrams summed by features."""
+        counts = self._key_bigrams
+        first, second = np.nonzero(counts)
+
+        return self._pair_sums(first, second, counts[first, second])
+
+    def _bigram_frequencies(self, sums: dict[str, float]) -> dict[str, float]:
+        """Calculate all bigram metrics from summed usages."""
+        repeats, _ = self._repeats
+        total = self.corpus.bigram_counts.sum()
+
+        sfb_weight = sums['same_finger'] - repeats
+
+        return {
+            'bigram_mean_distance': sums['distance'] / sums['usage'] / self.one_unit,
+            'same_finger_bigram_frequency': sfb_weight / total,
+            'same_finger_bigram_mean_distance': (
+                sums['same_finger_distance'] / sfb_weight / self.one_unit if sfb_weight else 0.0
+            ),
+            'full_scissor_bigram_frequency': sums['full_scissor'] / total,
+            'half_scissor_bigram_frequency': sums['half_scissor'] / total,
+            'lateral_stretch_bigram_frequency': sums['lateral_stretch'] / total,
+        }
+
+    @cached_property
+    def _bigram_metrics(self) -> dict[str, float]:
+        """Calculate all bigram metrics as masked sums of key pair counts."""
+        return self._bigram_frequencies(self._bigram_sums)
+
+    @cached_property
+    def bigram_mean_distance(self) -> float:
+        """Return mean distance between bigram keys."""
+        return self._bigram_metrics['bigram_mean_distance']
 
     def is_sfb(self, bigram: str) -> bool:
         """True if bigram are same-finger one.
@@ -270,46 +448,15 @@ class Keyboard():
 
         return left_key.finger == right_key.finger
 
-    def _ngram_frequency(self, ngrams: Counter, by: callable[str, bool]) -> float:
-        """Counts frequency by function filter for ngram counter."""
-        total_usage = 0
-
-        for ngram, usage in ngrams.items():
-            if by(ngram):
-                total_usage += usage
-
-        return total_usage / ngrams.total()
-
     @cached_property
     def same_finger_bigram_frequency(self) -> float:
         """Calculated same-finger bigram occurance frequency."""
-        bigrams = self.corpus.bigrams
-        return self._ngram_frequency(bigrams, self.is_sfb)
+        return self._bigram_metrics['same_finger_bigram_frequency']
 
     @cached_property
     def same_finger_bigram_mean_distance(self) -> float:
         """Return mean distance between same-finger bigrams in units."""
-        bigrams = self.corpus.bigrams
-
-        total_distance = 0
-        total_weight = 0
-
-        for bigram, weight in bigrams.items():
-            if not self.is_sfb(bigram):
-                continue
-
-            left_key = self.mapping_to_key(bigram[0])
-            right_key = self.mapping_to_key(bigram[-1])
-
-            distance = left_key.distance_to(right_key) * weight
-
-            total_distance += distance
-            total_weight += weight
-
-        if total_weight == 0:
-            return 0.0
-
-        return total_distance / total_weight / self.one_unit
+        return self._bigram_metrics['same_finger_bigram_mean_distance']
 
     def _is_scissor_bigram(self, bigram: str, full: bool) -> bool:
         """True if bigram are half or full scissor one.
@@ -339,45 +486,12 @@ class Keyboard():
         if not top_key or not bottom_key:
             return False
 
-        # Must be different fingers
-        if top_key.finger == bottom_key.finger:
-            return False
-
-        # Must be one hand fingers
-        if top_key.hand != bottom_key.hand:
-            return False
+        return self._is_scissor_keys(top_key, bottom_key, full)
 
-        # Must be around 2u of distance for full
-        distance = abs(top_key.y - bottom_key.y) / self.one_unit
-        if full:
-            if distance < 2:
-                return False
-
-        # Must be around 1u of distance for half
-        if not full:
-            if distance < 1 or distance >= 2:
-                return False
-
-        # Lower index means the higher must be finger
-        order = {
-            Keyboard.Finger.RIGHT_MIDDLE: 0, 
-            Keyboard.Finger.RIGHT_RING: 1,
-            Keyboard.Finger.RIGHT_PINKY: 2,
-            Keyboard.Finger.RIGHT_INDEX: 3,
-            Keyboard.Finger.RIGHT_THUMB: 4,
-
-            Keyboard.Finger.LEFT_MIDDLE: 0,
-            Keyboard.Finger.LEFT_RING: 1,
-            Keyboard.Finger.LEFT_PINKY: 2,
-            Keyboard.Finger.LEFT_INDEX: 3,
-            Keyboard.Finger.LEFT_THUMB: 4,
-        }
-
-        # Determine which key finger must be higher
-        if order[top_key.finger] > order[bottom_key.finger]:
-            top_key, bottom_key = bottom_key, top_key
-
-        return not (top_key.y < bottom_key.y)
+    def _is_scissor_keys(self, top_key: Key, bottom_key: Key, full: bool) -> bool:
+        """True if pair of keys are half or full scissor one."""
+        scissor = Keyboard.Scissor.FULL if full else Keyboard.Scissor.HALF
+        return self.scissors[top_key.index, bottom_key.index] == scissor
 
     def is_fsb(self, bigram: str) -> bool:
         """True if bigram are full scissor one."""
@@ -403,57 +517,31 @@ class Keyboard():
         if not left_key or not right_key:
             return False
 
-        # Must be one hand fingers
-        if left_key.hand != right_key.hand:
-            return False
-
-        # Get adjasments
-        finger_distance = left_key.finger - right_key.finger
-
-        adjasent = True if finger_distance == 1 else False
-        semi_adjasent = True if finger_distance == 2 else False
+        return self._is_lsb_keys(left_key, right_key)
 
-        # Get treshold by adjasment
-        if adjasent:
-            treshlod = 2
-        elif semi_adjasent:
-            treshlod = 3.5
-        else:
-            return False
-
-        distance = abs(left_key.x - right_key.x)
-        return distance / self.one_unit >= treshlod
+    def _is_lsb_keys(self, left_key: Key, right_key: Key) -> bool:
+        """True if pair of keys are lateral stretch."""
+        return self.lateral_stretches[left_key.index, right_key.index]
 
     @cached_property
     def full_scissor_bigram_frequency(self) -> float:
         """Calculates full scissor bigrams occurance frequency."""
-        bigrams = self.corpus.bigrams
-        return self._ngram_frequency(bigrams, self.is_fsb)
+        return self._bigram_metrics['full_scissor_bigram_frequency']
 
     @cached_property
     def half_scissor_bigram_frequency(self) -> float:
         """Calculates half scissor bigrams occurance frequency."""
-        bigrams = self.corpus.bigrams
-        return self._ngram_frequency(bigrams, self.is_hsb)
+        return self._bigram_metrics['half_scissor_bigram_frequency']
 
     @cached_property
     def lateral_stretch_bigram_frequency(self) -> float:
         """Calculates lateral stretch bigram occurance frequency."""
-        bigrams = self.corpus.bigrams
-        return self._ngram_frequency(bigrams, self.is_lsb)
+        return self._bigram_metrics['lateral_stretch_bigram_frequency']
 
     @cached_property
     def lateral_stretch_skipgram_frequency(self) -> float:
         """Calculates lateral stretch 1-skipgram occurance frequency."""
-        lsb = 0
-        trigrams = self.corpus.trigrams
-
-        for trigram, usage in trigrams.items():
-            bigram = trigram[0] + trigram[2]
-            if self.is_lsb(bigram):
-                lsb += usage
-
-        return lsb / trigrams.total()
+        return self._trigram_metrics['lateral_stretch_skipgram_frequency']
 
     def is_sfs(self, trigram: str) -> bool:
         """True if trigram are same-finger 1-skipgram.
@@ -478,6 +566,15 @@ class Keyboard():
 
         return left_key.finger == right_key.finger
 
+    def _trigram_keys(self, trigram: str) -> tuple[Key | None, Key | None, Key | None]:
+        """Return keys of trigram characters."""
+        assert len(trigram) == 3, 'trigram length must be 3'
+        return (
+            self.mapping_to_key(trigram[0]),
+            self.mapping_to_key(trigram[1]),
+            self.mapping_to_key(trigram[2]),
+        )
+
     def is_alternate(self, trigram: str) -> bool:
         """True if trigram are alternate hand typed.
 
@@ -486,15 +583,16 @@ class Keyboard():
         - Second characted typed with another hand
         - Third characted typed again with one (first) hand
         """
-        assert len(trigram) == 3, 'trigram length must be 3'
-        first_key = self.mapping_to_key(trigram[0])
-        second_key = self.mapping_to_key(trigram[1])
-        third_key = self.mapping_to_key(trigram[2])
+        keys = self._trigram_keys(trigram)
 
         # Keys not found
-        if not all([first_key, second_key, third_key]):
+        if not all(keys):
             return False
 
+        return self._is_alternate_keys(*keys)
+
+    def _is_alternate_keys(self, first_key: Key, second_key: Key, third_key: Key) -> bool:
+        """True if found keys are alternate hand typed."""
         return (
             first_key.hand == third_key.hand
             and first_key.hand != second_key.hand
@@ -507,15 +605,16 @@ class Keyboard():
         - Pressing two keys with one hand and other with another
         - Same pressed pair must be typed with different fingers
         """
-        assert len(trigram) == 3, 'trigram length must be 3'
-        first_key = self.mapping_to_key(trigram[0])
-        second_key = self.mapping_to_key(trigram[1])
-        third_key = self.mapping_to_key(trigram[2])
+        keys = self._trigram_keys(trigram)
 
         # Keys not found
-        if not all([first_key, second_key, third_key]):
+        if not all(keys):
             return False
 
+        return self._is_roll_keys(*keys)
+
+    def _is_roll_keys(self, first_key: Key, second_key: Key, third_key: Key) -> bool:
+        """True if found keys are two keys rolled."""
         return ((
                 # First and second keys are roll
                 first_key.hand == second_key.hand
@@ -546,6 +645,13 @@ class Keyboard():
             and f1.finger != f3.finger
         )
 
+    def _is_same_direction(self, first_key: Key, second_key: Key, third_key: Key) -> bool:
+        """True if fingers of keys goes in same direction."""
+        direction_12 = first_key.finger > second_key.finger
+        direction_23 = second_key.finger > third_key.finger
+
+        return direction_12 == direction_23
+
     def is_onehand(self, trigram: str) -> bool:
         """True if trigram are onehand rolled (3roll).
 
@@ -554,20 +660,12 @@ class Keyboard():
         - All characters typed with different fingers
         - All keys goes in same direction
         """
-        assert len(trigram) == 3, 'trigram length must be 3'
-        first_key = self.mapping_to_key(trigram[0])
-        second_key = self.mapping_to_key(trigram[1])
-        third_key = self.mapping_to_key(trigram[2])
+        keys = self._trigram_keys(trigram)
 
-        if not self._is_shdf(first_key, second_key, third_key):
+        if not self._is_shdf(*keys):
             return False
 
-        direction_12 = first_key.finger > second_key.finger
-        direction_23 = second_key.finger > third_key.finger
-
-        return (
-            direction_12 == direction_23
-        )
+        return self._is_same_direction(*keys)
 
     def is_redirect(self, trigram: str) -> bool:
         """True if trigram are redirect one.
@@ -577,98 +675,217 @@ class Keyboard():
         - All characters typed with different fingers
         - Direction of typing first 2 characters don't match last 2
         """
-        assert len(trigram) == 3, 'trigram length must be 3'
-        first_key = self.mapping_to_key(trigram[0])
-        second_key = self.mapping_to_key(trigram[1])
-        third_key = self.mapping_to_key(trigram[2])
+        keys = self._trigram_keys(trigram)
 
-        if not self._is_shdf(first_key, second_key, third_key):
+        if not self._is_shdf(*keys):
             return False
 
-        direction_12 = first_key.finger > second_key.finger
-        direction_23 = second_key.finger > third_key.finger
+        return not self._is_same_direction(*keys)
 
-        return (
-            direction_12 != direction_23
+    @cached_property
+    def _key_trigrams(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return skipgram key pairs and finger triples counts.
+
+        Return matrix of first and last key usages and usages
+        of fingers of trigrams with all keys found.
+        """
+        _, _, trigrams = self.key_counts
+
+        # Middle character of skipgram may be not mapped
+        skipgrams = self.corpus.counts.project_pairs(
+            self.corpus.skipgram_counts, self.char_indexes, len(self.geometry)
         )
 
+        first, second, third = np.nonzero(trigrams)
+        fingers = self.key_fingers - 1
+        codes = (fingers[first] * 10 + fingers[second]) * 10 + fingers[third]
+        fingers = np.bincount(
+            codes, weights=trigrams[first, second, third], minlength=1000
+        ).astype(np.int64).reshape(10, 10, 10)
+
+        return skipgrams, fingers
+
     @cached_property
-    def same_finger_skipgram_frequency(self) -> float:
-        """Return same-finger 1-skipgram occurance frequency."""
-        trigrams = self.corpus.trigrams
-        return self._ngram_frequency(trigrams, self.is_sfs)
+    def _trigram_sums(self) -> tuple[dict[str, float], dict[str, float]]:
+        """Return usages of skipgrams and trigrams summed by features."""
+        skipgrams, fingers = self._key_trigrams
+
+        first, third = np.nonzero(skipgrams)
+        skipgram_sums = self._pair_sums(first, third, skipgrams[first, third])
+
+        first, second, third = np.nonzero(fingers)
+        pattern_sums = Keyboard._pattern_sums(
+            first, second, third, fingers[first, second, third]
+        )
+
+        return skipgram_sums, pattern_sums
+
+    def _trigram_frequencies(self, skipgram_sums: dict[str, float], pattern_sums: dict[str, float]) -> dict[str, float]:
+        """Calculate all trigram metrics from summed usages."""
+        _, repeats = self._repeats
+        total = self.corpus.counts.trigram_total
+
+        sfs_weight = skipgram_sums['same_finger'] - repeats
+
+        return {
+            'same_finger_skipgram_frequency': sfs_weight / total,
+            'same_finger_skipgram_mean_distance': (
+                skipgram_sums['same_finger_distance'] / sfs_weight / self.one_unit if sfs_weight else 0.0
+            ),
+            'full_scissor_skipgram_frequency': skipgram_sums['full_scissor'] / total,
+            'half_scissor_skipgram_frequency': skipgram_sums['half_scissor'] / total,
+            'lateral_stretch_skipgram_frequency': skipgram_sums['lateral_stretch'] / total,
+            'alternate_frequency': pattern_sums['alternate'] / total,
+            'roll_frequency': pattern_sums['roll'] / total,
+            'onehand_frequency': pattern_sums['onehand'] / total,
+            'redirect_frequency': pattern_sums['redirect'] / total,
+        }
 
     @cached_property
-    def same_finger_skipgram_mean_distance(self) -> float:
-        """Return mean distance between same-finger 1-skipgram in units."""
-        trigrams = self.corpus.trigrams
+    def _trigram_metrics(self) -> dict[str, float]:
+        """Calculate all trigram metrics as masked sums of key counts."""
+        return self._trigram_frequencies(*self._trigram_sums)
 
-        total_distance = 0
-        total_weight = 0
+    def _ngram_sums(self, indexes: np.ndarray, bigrams: tuple[np.ndarray, np.ndarray], trigrams: tuple[np.ndarray, np.ndarray]) -> tuple[dict, dict, dict]:
+        """Return summed usages of given corpus n-grams.
 
-        for trigram, weight in trigrams.items():
-            if not self.is_sfs(trigram):
-                continue
+        N-grams are given by alphabet indexes with usages and
+        mapped on keys by given key index of each character.
+        """
+        positions, usages = bigrams
+        first, second = indexes[positions[:, 0]], indexes[positions[:, 1]]
+        found = (first >= 0) & (second >= 0)
+        bigram_sums = self._pair_sums(first[found], second[found], usages[found])
+
+        # Middle character of skipgram may be not mapped
+        positions, usages = trigrams
+        first, second, third = indexes[positions[:, 0]], indexes[positions[:, 1]], indexes[positions[:, 2]]
+        found = (first >= 0) & (third >= 0)
+        skipgram_sums = self._pair_sums(first[found], third[found], usages[found])
+
+        found &= second >= 0
+        fingers = self.key_fingers - 1
+        pattern_sums = Keyboard._pattern_sums(
+            fingers[first[found]], fingers[second[found]], fingers[third[found]], usages[found]
+        )
+
+        return bigram_sums, skipgram_sums, pattern_sums
+
+    def _swapped_sums(self, first: int, second: int) -> tuple[np.ndarray, dict, dict, dict]:
+        """Return key indexes of characters and summed usages after swap.
 
-            left_key = self.mapping_to_key(trigram[0])
-            right_key = self.mapping_to_key(trigram[2])
+        Only corpus n-grams with characters of swapped keys are
+        recalculated, found by adjacency of characters in n-grams.
+        """
+        indexes = self.char_indexes
+        chars = np.flatnonzero((indexes == first) | (indexes == second))
+
+        swapped = indexes.copy()
+        swapped[indexes == first] = second
+        swapped[indexes == second] = first
 
-            distance = left_key.distance_to(right_key) * weight
+        counts = self.corpus.counts
+        bigrams = counts.adjacent(2, chars)
+        trigrams = counts.adjacent(3, chars)
 
-            total_distance += distance
-            total_weight += weight
+        before = self._ngram_sums(indexes, bigrams, trigrams)
+        after = self._ngram_sums(swapped, bigrams, trigrams)
 
-        if total_weight == 0:
-            return 0.0
+        # Replace affected n-grams in summed usages of whole corpus
+        bigram_sums, skipgram_sums, pattern_sums = [
+            {name: sums[name] - old[name] + new[name] for name in sums}
+            for sums, old, new in zip(
+                (self._bigram_sums, *self._trigram_sums), before, after
+            )
+        ]
 
-        return total_distance / total_weight / self.one_unit
+        return swapped, bigram_sums, skipgram_sums, pattern_sums
+
+    def swap_delta(self, first_key_code: str, second_key_code: str) -> dict[str, float]:
+        """Return changes of metrics if mappings of two keys are swapped.
+
+        Keyboard is not changed. `bigram_mean_distance` shows
+        change of travel distance between keys.
+        """
+        _, bigram_sums, skipgram_sums, pattern_sums = self._swapped_sums(
+            self.geometry.indexes[first_key_code],
+            self.geometry.indexes[second_key_code],
+        )
+
+        current = {**self._bigram_metrics, **self._trigram_metrics}
+        swapped_metrics = {
+            **self._bigram_frequencies(bigram_sums),
+            **self._trigram_frequencies(skipgram_sums, pattern_sums),
+        }
+
+        return {
+            name: value - current[name]
+            for name, value in swapped_metrics.items()
+        }
+
+    def swap_keys(self, first_key_code: str, second_key_code: str):
+        """Swap mappings of two keys, updating metrics incrementally."""
+        first = self.geometry.indexes[first_key_code]
+        second = self.geometry.indexes[second_key_code]
+
+        swapped, bigram_sums, skipgram_sums, pattern_sums = self._swapped_sums(first, second)
+        repeats = self._repeats
+
+        # Overlay is shared with other keyboards, so it's copied on change
+        layouts = list(self._key_layouts)
+        layouts[first], layouts[second] = layouts[second], layouts[first]
+        mapping_to_index = dict(self._mapping_to_index)
+
+        for index in (first, second):
+            for char in layouts[index].get('mappings', {}).values():
+                mapping_to_index[char] = index
+
+        self._key_layouts = layouts
+        self._mapping_to_index = mapping_to_index
+
+        # Keep values that are already updated or not changed by swap
+        self._drop_cache()
+        self.char_indexes = swapped
+        self._repeats = repeats
+        self._bigram_sums = bigram_sums
+        self._trigram_sums = skipgram_sums, pattern_sums
 
     @cached_property
-    def full_scissor_skipgram_frequency(self) -> float:
-        """Calculates full scissor 1-skipgram occurance frequency."""
-        fss = 0
-        trigrams = self.corpus.trigrams
+    def same_finger_skipgram_frequency(self) -> float:
+        """Return same-finger 1-skipgram occurance frequency."""
+        return self._trigram_metrics['same_finger_skipgram_frequency']
 
-        for trigram, usage in trigrams.items():
-            bigram = trigram[0] + trigram[2]
-            if self.is_fsb(bigram):
-                fss += usage
+    @cached_property
+    def same_finger_skipgram_mean_distance(self) -> float:
+        """Return mean distance between same-finger 1-skipgram in units."""
+        return self._trigram_metrics['same_finger_skipgram_mean_distance']
 
-        return fss / trigrams.total()
+    @cached_property
+    def full_scissor_skipgram_frequency(self) -> float:
+        """Calculates full scissor 1-skipgram occurance frequency."""
+        return self._trigram_metrics['full_scissor_skipgram_frequency']
 
     @cached_property
     def half_scissor_skipgram_frequency(self) -> float:
         """Calculates half scissor 1-skipgram occurance frequency."""
-        hss = 0
-        trigrams = self.corpus.trigrams
-
-        for trigram, usage in trigrams.items():
-            bigram = trigram[0] + trigram[2]
-            if self.is_hsb(bigram):
-                hss += usage
-
-        return hss / trigrams.total()
+        return self._trigram_metrics['half_scissor_skipgram_frequency']
 
     @cached_property
     def alternate_frequency(self) -> float:
         """Return alternate trigram occurance frequency."""
-        trigrams = self.corpus.trigrams
-        return self._ngram_frequency(trigrams, self.is_alternate)
+        return self._trigram_metrics['alternate_frequency']
 
     @cached_property
     def roll_frequency(self) -> float:
         """Return roll (2roll) trigram occurance frequency."""
-        trigrams = self.corpus.trigrams
-        return self._ngram_frequency(trigrams, self.is_roll)
+        return self._trigram_metrics['roll_frequency']
 
     @cached_property
     def onehand_frequency(self) -> float:
         """Return onehand (3roll) trigram occurance frequency."""
-        trigrams = self.corpus.trigrams
-        return self._ngram_frequency(trigrams, self.is_onehand)
+        return self._trigram_metrics['onehand_frequency']
 
     @cached_property
     def redirect_frequency(self) -> float:
         """Return redirect trigram occurance frequency."""
-        trigrams = self.corpus.trigrams
-        return self._ngram_frequency(trigrams, self.is_redirect)
+        return self._trigram_metrics['redirect_frequency']
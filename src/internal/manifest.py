@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import uuid
+
+
+class Manifest():
+    """Completion state of jobs of batch run, saved after each job.
+
+    Each finished job is saved with hash of its inputs and number
+    of run. Interrupted run is resumed by next one, skipping its
+    finished jobs. After complete run next one starts anew, unless
+    only jobs with changed inputs are asked.
+    """
+
+    def __init__(self, path, only_changed: bool = False):
+        """Open manifest file, new run is started if last one is complete."""
+        self.path = pathlib.Path(path)
+        self.only_changed = only_changed
+        self._lock = threading.Lock()
+
+        self.run = 0
+        self.complete = True
+        self.jobs: dict[str, dict] = {}
+
+        if self.path.is_file():
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            self.run = data['run']
+            self.complete = data['complete']
+            self.jobs = data['jobs']
+
+        if self.complete:
+            self.run += 1
+            self.complete = False
+
+    @staticmethod
+    def inputs_hash(*inputs) -> str:
+        """Return hash of job inputs, given as strings or JSON values."""
+        return hashlib.sha256(
+            json.dumps(inputs, sort_keys=True, ensure_ascii=False).encode()
+        ).hexdigest()
+
+    def is_done(self, job: str, inputs: str) -> bool:
+        """Check if job with same inputs is finished by this run.
+
+        Jobs of previous runs count if only changed are asked.
+        """
+        with self._lock:
+            entry = self.jobs.get(job)
+
+        if entry is None or entry['inputs'] != inputs:
+            return False
+
+        return self.only_changed or entry['run'] == self.run
+
+    def finish(self, job: str, inputs: str):
+        """Save job as finished with given inputs."""
+        with self._lock:
+            self.jobs[job] = {'inputs': inputs, 'run': self.run}
+            self._save()
+
+    def close(self, complete: bool):
+        """Save run as complete, so next run starts anew, or as interrupted."""
+        with self._lock:
+            self.complete = complete
+            self._save()
+
+    def _save(self):
+        """Write whole manifest at once, so it's never saved partially."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Temporary name is unique for each run writing same manifest
+        temporary_path = self.path.with_name(f'{self.path.name}.{uuid.uuid4().hex}.tmp')
+        temporary_path.write_text(json.dumps({
+            'run': self.run,
+            'complete': self.complete,
+            'jobs': self.jobs,
+        }, ensure_ascii=False, indent=1), encoding='utf-8')
+
+        os.replace(temporary_path, self.path)
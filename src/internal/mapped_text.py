@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import contextlib
+import mmap
+import pathlib
+from typing import Iterator
+
+import numpy as np
+
+from internal.ngrams import NgramCounts
+
+# Bytes of mapped file scanned at once
+WINDOW_SIZE = 1 << 22
+
+
+class MappedText():
+    """Read-only memory map of UTF-8 corpus files.
+
+    Files are scanned by windows over mapped pages, so memory usage
+    doesn't depend on corpus size, and pages are shared between
+    processes that read the same corpus. File is mapped only while
+    its window is read, so no files are kept open.
+
+    Window is decoded straight from mapped pages without copying
+    its bytes, but its text and code points are built in memory,
+    as UTF-8 can't be counted by NumPy views. Text is decoded same
+    way as text mode of open(), so counts are same as of corpus
+    loaded by chunks.
+    """
+
+    def __init__(self, files: list[pathlib.Path]):
+        """Prepare mapping of given files."""
+        self.files = files
+
+        # Empty files can't be mapped
+        self._files = [file for file in files if file.stat().st_size > 0]
+
+    def __len__(self) -> int:
+        """Return total size of files in bytes."""
+        return sum(file.stat().st_size for file in self._files)
+
+    @contextlib.contextmanager
+    def _map(self, i: int) -> Iterator[mmap.mmap]:
+        """Map file by its index until end of context."""
+        with open(self._files[i], 'rb') as source:
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    @staticmethod
+    def _is_boundary(data: mmap.mmap, position: int) -> bool:
+        """Check if text can be split before byte without changing its decoding.
+
+        LF and ASCII chars other than LF end incomplete characters
+        and CRLF line endings, even after invalid bytes.
+        """
+        return data[position - 1] == 0x0A or (data[position] < 0x80 and data[position] != 0x0A)
+
+    @staticmethod
+    def _windows(data: mmap.mmap, window_size: int) -> Iterator[tuple[int, int]]:
+        """Yield bounds of windows decoded same way as whole text."""
+        start = 0
+
+        while start < len(data):
+            end = min(start + window_size, len(data))
+
+            # Step back to boundary
+            while start < end < len(data) and not MappedText._is_boundary(data, end):
+                end -= 1
+
+            # Window has no boundary
+            if end == start:
+                end = start + window_size
+                while end < len(data) and not MappedText._is_boundary(data, end):
+                    end += 1
+
+            yield start, min(end, len(data))
+            start = end
+
+    @staticmethod
+    def decode(data: bytes | memoryview) -> str:
+        """Decode UTF-8 bytes as text mode does, skipping invalid bytes.
+
+        Line endings CRLF and CR are translated to LF.
+        """
+        text = str(data, 'utf-8', errors='ignore')
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def windows(self, window_size: int = WINDOW_SIZE) -> list[tuple[int, int, int]]:
+        """Return windows of mapped text as (file, start, end) bytes ranges."""
+        windows = []
+
+        for i in range(len(self._files)):
+            with self._map(i) as mapped:
+                for start, end in MappedText._windows(mapped, window_size):
+                    windows.append((i, start, end))
+
+        return windows
+
+    def window_text(self, window: tuple[int, int, int]) -> str:
+        """Return mapped text in given window."""
+        i, start, end = window
+
+        # Views are released before file is unmapped
+        with self._map(i) as mapped, memoryview(mapped) as view, view[start:end] as window:
+            return MappedText.decode(window)
+
+    def window_points(self, window: tuple[int, int, int]) -> np.ndarray:
+        """Return code points of mapped text in given window."""
+        return NgramCounts.points(self.window_text(window))
+
+    def points(self, window_size: int = WINDOW_SIZE) -> Iterator[np.ndarray]:
+        """Yield code points of mapped text by windows."""
+        for window in self.windows(window_size):
+            yield self.window_points(window)
+
+    def chunks(self, window_size: int = WINDOW_SIZE) -> Iterator[str]:
+        """Yield mapped text by windows."""
+        for window in self.windows(window_size):
+            yield self.window_text(window)
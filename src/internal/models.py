@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib
+import pickle
+import tempfile
+
+import yaml
+
+# Parser of LibYAML is used if PyYAML is built with it
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Parsed models by file path with stamp of parsed file
+_models: dict[pathlib.Path, tuple[tuple[int, int], dict]] = {}
+
+
+def cache_path(model_path: pathlib.Path) -> pathlib.Path:
+    """Return path of compiled model in cache folder next to model."""
+    return model_path.parent / '.cache' / f'{model_path.name}.pickle'
+
+
+def _stamp(model_path: pathlib.Path) -> tuple[int, int]:
+    """Return size and modification time of model file."""
+    stat = model_path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _save(model_path: pathlib.Path, stamp: tuple[int, int], digest: str, model: dict):
+    """Save compiled model with stamp and hash of its file."""
+    path = cache_path(model_path)
+    path.parent.mkdir(exist_ok=True)
+
+    # Write whole file at once, so readers never see partial cache,
+    # temporary name is unique for each writer of same cache
+    file = tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=path.name, suffix='.tmp', delete=False
+    )
+    try:
+        with file:
+            pickle.dump(
+                {'stamp': stamp, 'hash': digest, 'model': model},
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+        os.replace(file.name, path)
+    except BaseException:
+        os.unlink(file.name)
+        raise
+
+
+def compile_model(model_path) -> dict:
+    """Parse YAML model and save it in compiled form."""
+    model_path = pathlib.Path(model_path)
+    stamp = _stamp(model_path)
+    text = model_path.read_bytes()
+
+    model = yaml.load(text, Loader=Loader)
+    _save(model_path, stamp, hashlib.sha256(text).hexdigest(), model)
+
+    return model
+
+
+def model_hash(model_path) -> str:
+    """Return hash of model file content."""
+    return hashlib.sha256(pathlib.Path(model_path).read_bytes()).hexdigest()
+
+
+def model_digest(model: dict) -> str:
+    """Return hash of model content, same for equal models."""
+    return hashlib.sha256(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def _load_compiled(model_path: pathlib.Path, stamp: tuple[int, int]) -> dict | None:
+    """Load compiled model. None if missing or outdated."""
+    path = cache_path(model_path)
+    if not path.is_file():
+        return None
+
+    # Partial or corrupt cache is parsed again
+    try:
+        with open(path, 'rb') as file:
+            compiled = pickle.load(file)
+    except (pickle.UnpicklingError, EOFError, OSError):
+        return None
+
+    if compiled['stamp'] == stamp:
+        return compiled['model']
+
+    # File is touched, but may be not changed
+    digest = hashlib.sha256(model_path.read_bytes()).hexdigest()
+    if compiled['hash'] != digest:
+        return None
+
+    _save(model_path, stamp, digest, compiled['model'])
+    return compiled['model']
+
+
+def load_model(model_path) -> dict:
+    """Return parsed YAML model of keyboard or layout.
+
+    Model is reused from memory or compiled cache while its file
+    is not changed. Same object is returned for same file, so
+    model must not be changed by caller.
+    """
+    model_path = pathlib.Path(model_path).resolve()
+    stamp = _stamp(model_path)
+
+    cached = _models.get(model_path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    model = _load_compiled(model_path, stamp)
+    if model is None:
+        model = compile_model(model_path)
+
+    _models[model_path] = stamp, model
+    return model
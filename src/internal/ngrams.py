@@ -0,0 +1,496 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import tempfile
+import zipfile
+from collections import Counter
+from functools import cached_property
+
+import numpy as np
+
+# Bits of alphabet index in trigram code, fit any unicode character
+INDEX_BITS = 21
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+
+class NgramCounts():
+    """Unigram, bigram and trigram counts of text.
+
+    Text is mapped on small integer alphabet once, then
+    n-grams are counted with bincount on combined codes
+    of alphabet indexes. Text can be fed by chunks.
+
+    Unigrams and bigrams are dense arrays. Trigrams are
+    sparse, only used ones are kept as sorted codes with
+    their usages, so memory doesn't grow with cube of alphabet.
+    """
+
+    # Values derived from counts, dropped when counts change
+    CACHED = ('_lookup', '_adjacency', 'trigrams', 'skipgrams')
+
+    def __init__(self):
+        """Create empty counts."""
+        self.alphabet = ''
+        self._index: dict[int, int] = {}
+        self._capacity = 0
+
+        self._unigrams = np.zeros(0, dtype=np.int64)
+        self._bigrams = np.zeros((0, 0), dtype=np.int64)
+        self._trigram_codes = np.zeros(0, dtype=np.int64)
+        self._trigram_usages = np.zeros(0, dtype=np.int64)
+
+        # First and last two characters of counted text
+        self.head = ''
+        self.tail = ''
+
+    @classmethod
+    def from_text(self, text: str, chunk_size: int) -> NgramCounts:
+        """Count n-grams of given text by chunks."""
+        counts = NgramCounts()
+
+        for i in range(0, len(text), chunk_size):
+            counts.update(text[i:i+chunk_size])
+
+        return counts
+
+    @classmethod
+    def from_arrays(cls, alphabet: str, unigrams: np.ndarray, bigrams: np.ndarray, trigram_codes: np.ndarray, trigram_usages: np.ndarray, head: str = '', tail: str = '') -> NgramCounts:
+        """Create counts over given count arrays without copying them."""
+        counts = cls()
+        counts.alphabet = alphabet
+        counts._index = {ord(char): i for i, char in enumerate(alphabet)}
+        counts._capacity = len(alphabet)
+
+        counts._unigrams = unigrams
+        counts._bigrams = bigrams
+        counts._trigram_codes = trigram_codes
+        counts._trigram_usages = trigram_usages
+        counts.head = head
+        counts.tail = tail
+
+        return counts
+
+    def __getstate__(self) -> dict:
+        """Pickle only filled part of count arrays, without cached values."""
+        state = self.__dict__.copy()
+        for attr in NgramCounts.CACHED:
+            state.pop(attr, None)
+
+        state['_capacity'] = self.size
+        state['_unigrams'] = self.unigrams.copy()
+        state['_bigrams'] = self.bigrams.copy()
+
+        return state
+
+    def _drop_cache(self):
+        """Drop values derived from counts."""
+        for attr in NgramCounts.CACHED:
+            self.__dict__.pop(attr, None)
+
+    @classmethod
+    def load(self, path: pathlib.Path, key: str) -> NgramCounts | None:
+        """Load counts from cache file. None if missing or outdated."""
+        if not path.is_file():
+            return None
+
+        # Partial or corrupt cache is counted again
+        try:
+            with np.load(path) as data:
+                if str(data['key']) != key:
+                    return None
+
+                counts = NgramCounts()
+                alphabet = data['alphabet'].tolist()
+                n = len(alphabet)
+
+                counts.alphabet = ''.join(map(chr, alphabet))
+                counts._index = {point: i for i, point in enumerate(alphabet)}
+                counts._grow(n)
+
+                bigrams = np.zeros(n * n, dtype=np.int64)
+                bigrams[data['bigram_indexes']] = data['bigram_usages']
+
+                counts.unigrams[:] = data['unigrams']
+                counts.bigrams[:] = bigrams.reshape(n, n)
+                counts._trigram_codes = data['trigram_codes']
+                counts._trigram_usages = data['trigram_usages']
+                counts.head, counts.tail = data['ends'].tolist()
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+        return counts
+
+    def save(self, path: pathlib.Path, key: str):
+        """Save counts to compact cache file marked by key."""
+        bigrams = self.bigrams.ravel()
+        bigram_indexes = np.flatnonzero(bigrams)
+
+        # Write whole file at once, so readers never see partial cache,
+        # temporary name is unique for each writer of same cache
+        file = tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name, suffix='.tmp', delete=False
+        )
+        try:
+            with file:
+                np.savez(
+                    file,
+                    key=key,
+                    alphabet=np.array([ord(char) for char in self.alphabet], dtype=np.uint32),
+                    unigrams=self.unigrams,
+                    bigram_indexes=bigram_indexes,
+                    bigram_usages=bigrams[bigram_indexes],
+                    trigram_codes=self._trigram_codes,
+                    trigram_usages=self._trigram_usages,
+                    ends=np.array([self.head, self.tail]),
+                )
+
+            os.replace(file.name, path)
+        except BaseException:
+            os.unlink(file.name)
+            raise
+
+    @property
+    def size(self) -> int:
+        """Return number of characters in alphabet."""
+        return len(self.alphabet)
+
+    @property
+    def unigrams(self) -> np.ndarray:
+        """Return vector of unigram counts by alphabet index."""
+        n = self.size
+        return self._unigrams[:n]
+
+    @property
+    def bigrams(self) -> np.ndarray:
+        """Return matrix of bigram counts by alphabet indexes."""
+        n = self.size
+        return self._bigrams[:n, :n]
+
+    @cached_property
+    def trigrams(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return alphabet indexes of used trigrams and their usages.
+
+        Indexes are matrix with row of three indexes for each trigram.
+        """
+        codes = self._trigram_codes
+        indexes = np.stack(
+            (codes >> 2 * INDEX_BITS, (codes >> INDEX_BITS) & INDEX_MASK, codes & INDEX_MASK),
+            axis=1,
+        )
+
+        return indexes, self._trigram_usages
+
+    @cached_property
+    def skipgrams(self) -> np.ndarray:
+        """Return matrix of 1-skipgram counts, first and last chars of trigrams."""
+        indexes, usages = self.trigrams
+        n = self.size
+
+        skipgrams = np.zeros(n * n, dtype=np.int64)
+        np.add.at(skipgrams, indexes[:, 0] * n + indexes[:, 2], usages)
+
+        return skipgrams.reshape(n, n)
+
+    @property
+    def trigram_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return sorted codes of used trigrams and their usages."""
+        return self._trigram_codes, self._trigram_usages
+
+    @property
+    def trigram_total(self) -> int:
+        """Return number of trigrams in text."""
+        return int(self._trigram_usages.sum())
+
+    @staticmethod
+    def trigram_codes(first: np.ndarray, second: np.ndarray, third: np.ndarray) -> np.ndarray:
+        """Combine alphabet indexes of trigrams into codes."""
+        return (first << 2 * INDEX_BITS) | (second << INDEX_BITS) | third
+
+    def _grow(self, size: int):
+        """Extend count arrays to fit alphabet of given size."""
+        if size <= self._capacity:
+            return
+
+        # Capacity is doubled, so arrays are copied few times
+        capacity = max(self._capacity, 32)
+        while capacity < size:
+            capacity *= 2
+
+        n = self._capacity
+
+        unigrams = np.zeros(capacity, dtype=np.int64)
+        bigrams = np.zeros((capacity, capacity), dtype=np.int64)
+
+        unigrams[:n] = self._unigrams
+        bigrams[:n, :n] = self._bigrams
+
+        self._unigrams = unigrams
+        self._bigrams = bigrams
+        self._capacity = capacity
+
+    @staticmethod
+    def points(text: str) -> np.ndarray:
+        """Return array of text unicode code points."""
+        return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+    @staticmethod
+    def chars(points: np.ndarray) -> str:
+        """Return text of given code points."""
+        return ''.join(map(chr, points.tolist()))
+
+    def encode(self, text: str) -> np.ndarray:
+        """Map text to array of alphabet indexes, extending alphabet."""
+        return self.encode_points(NgramCounts.points(text))
+
+    @cached_property
+    def _lookup(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return sorted alphabet code points and their indexes."""
+        points = np.array(sorted(self._index), dtype=np.uint32)
+        indexes = np.array([self._index[point] for point in points.tolist()], dtype=np.int64)
+
+        return points, indexes
+
+    def lookup(self, points: np.ndarray) -> np.ndarray:
+        """Map code points to alphabet indexes without extending alphabet.
+
+        Characters that are not in alphabet are marked as -1.
+        """
+        alphabet, indexes = self._lookup
+        if not len(alphabet):
+            return np.full(len(points), -1, dtype=np.int64)
+
+        positions = np.searchsorted(alphabet, points)
+        positions = np.minimum(positions, len(alphabet) - 1)
+
+        found = alphabet[positions] == points
+        return np.where(found, indexes[positions], -1)
+
+    def encode_points(self, points: np.ndarray) -> np.ndarray:
+        """Map code points to alphabet indexes, extending alphabet."""
+        uniques, inverse = np.unique(points, return_inverse=True)
+
+        for point in uniques.tolist():
+            if point not in self._index:
+                self._index[point] = len(self.alphabet)
+                self.alphabet += chr(point)
+
+                # Alphabet is extended, lookup is outdated
+                self._drop_cache()
+
+        self._grow(self.size)
+
+        lookup = np.array(
+            [self._index[point] for point in uniques.tolist()],
+            dtype=np.int64
+        )
+        return lookup[inverse]
+
+    @staticmethod
+    def _add(counts: np.ndarray, codes: np.ndarray):
+        """Add occurrences of combined codes to flat counts."""
+        if len(codes) == 0:
+            return
+
+        occurrences = np.bincount(codes)
+        counts.reshape(-1)[:len(occurrences)] += occurrences
+
+    def _add_trigrams(self, codes: np.ndarray, usages: np.ndarray | None = None):
+        """Add usages of trigram codes, one for each code by default."""
+        if len(codes) == 0:
+            return
+
+        if usages is None:
+            codes, usages = np.unique(codes, return_counts=True)
+        else:
+            # Sum usages of same codes
+            order = np.argsort(codes, kind='stable')
+            codes, usages = codes[order], usages[order]
+
+            starts = np.flatnonzero(np.diff(codes, prepend=-1))
+            codes, usages = codes[starts], np.add.reduceat(usages, starts)
+
+        positions = np.searchsorted(self._trigram_codes, codes)
+
+        found = positions < len(self._trigram_codes)
+        found[found] = self._trigram_codes[positions[found]] == codes[found]
+
+        # Used trigrams are counted in place, new ones are inserted in order
+        self._trigram_usages[positions[found]] += usages[found]
+
+        new = ~found
+        self._trigram_codes = np.insert(self._trigram_codes, positions[new], codes[new])
+        self._trigram_usages = np.insert(self._trigram_usages, positions[new], usages[new])
+
+    def update(self, text: str):
+        """Count n-grams of next chunk of text."""
+        self.update_points(NgramCounts.points(text))
+
+    def update_points(self, points: np.ndarray):
+        """Count n-grams of next chunk of text given by code points.
+
+        Last two characters of previous chunk are carried,
+        so n-grams on boundary of chunks are counted too.
+        """
+        if not len(points):
+            return
+
+        # Counts are changed, derived values are outdated
+        self._drop_cache()
+
+        carry = len(self.tail)
+        window = np.concatenate((NgramCounts.points(self.tail), points))
+        codes = self.encode_points(window)
+        capacity = self._capacity
+
+        NgramCounts._add(self._unigrams, codes[carry:])
+
+        pairs = codes[max(carry - 1, 0):]
+        NgramCounts._add(
+            self._bigrams,
+            pairs[:-1] * capacity + pairs[1:]
+        )
+
+        self._add_trigrams(
+            NgramCounts.trigram_codes(codes[:-2], codes[1:-1], codes[2:])
+        )
+
+        if len(self.head) < 2:
+            self.head = (self.head + NgramCounts.chars(points[:2]))[:2]
+        self.tail = NgramCounts.chars(window[-2:])
+
+    def merge(self, other: NgramCounts):
+        """Add counts of text that directly follows counted one.
+
+        N-grams that cross boundary of both texts are counted
+        by tail of this counts and head of other one.
+        """
+        if not other.size:
+            return
+
+        # Counts are changed, derived values are outdated
+        self._drop_cache()
+
+        # Map other alphabet indexes to own ones
+        lookup = self.encode(other.alphabet)
+
+        self._unigrams[lookup] += other.unigrams
+        self._bigrams[np.ix_(lookup, lookup)] += other.bigrams
+
+        indexes, usages = other.trigrams
+        self._add_trigrams(
+            NgramCounts.trigram_codes(*lookup[indexes].T), usages
+        )
+
+        junction = len(self.tail)
+        codes = self.encode(self.tail + other.head)
+
+        for i in range(len(codes) - 1):
+            if i < junction < i + 2:
+                self._bigrams[codes[i], codes[i + 1]] += 1
+
+        self._add_trigrams(np.array([
+            NgramCounts.trigram_codes(*codes[i:i + 3])
+            for i in range(len(codes) - 2)
+            if i < junction < i + 3
+        ], dtype=np.int64))
+
+        if len(self.head) < 2:
+            self.head = (self.head + other.head)[:2]
+        self.tail = (self.tail + other.tail)[-2:]
+
+    @cached_property
+    def _adjacency(self) -> dict[int, tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Return per character indexes of used bigrams and trigrams.
+
+        For each n-gram length return alphabet indexes and usages
+        of used n-grams, ids of n-grams grouped by characters they
+        contain and offsets of each character group.
+        """
+        adjacency = {}
+
+        bigram_positions = np.stack(np.nonzero(self.bigrams), axis=1)
+        bigrams = (bigram_positions, self.bigrams[tuple(bigram_positions.T)])
+
+        for n, (positions, usages) in ((2, bigrams), (3, self.trigrams)):
+            m = len(positions)
+
+            # Pairs of character and n-gram id, once per n-gram
+            pairs = np.unique(positions.T.ravel() * m + np.tile(np.arange(m), n))
+            chars, ids = np.divmod(pairs, max(m, 1))
+            offsets = np.concatenate(
+                ([0], np.cumsum(np.bincount(chars, minlength=self.size)))
+            )
+
+            adjacency[n] = (positions, usages, ids, offsets)
+
+        return adjacency
+
+    def adjacent(self, n: int, chars: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return used n-grams that contain any of given characters.
+
+        Characters and n-grams are given by alphabet indexes,
+        n-grams are returned once with their usages.
+        """
+        positions, usages, ids, offsets = self._adjacency[n]
+
+        ids = np.unique(np.concatenate(
+            [ids[offsets[char]:offsets[char + 1]] for char in chars.tolist()]
+            or [np.zeros(0, dtype=np.int64)]
+        ))
+
+        return positions[ids], usages[ids]
+
+    @staticmethod
+    def project_pairs(counts: np.ndarray, indexes: np.ndarray, size: int) -> np.ndarray:
+        """Project matrix of character pair counts on groups of characters.
+
+        Characters with negative group index are dropped.
+        """
+        mapped = np.flatnonzero(indexes >= 0)
+
+        onehot = np.zeros((len(indexes), size), dtype=np.int64)
+        onehot[mapped, indexes[mapped]] = 1
+
+        return onehot.T @ counts @ onehot
+
+    def project(self, indexes: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Project counts on groups of characters, like keys of layout.
+
+        Group indexes are given by alphabet index, characters with
+        negative group index are dropped. Return unigram, bigram
+        and trigram counts of groups.
+        """
+        mapped = indexes >= 0
+
+        unigrams = np.zeros(size, dtype=np.int64)
+        np.add.at(unigrams, indexes[mapped], self.unigrams[mapped])
+
+        bigrams = NgramCounts.project_pairs(self.bigrams, indexes, size)
+
+        positions, usages = self.trigrams
+        first, second, third = indexes[positions].T
+        found = (first >= 0) & (second >= 0) & (third >= 0)
+
+        codes = (first[found] * size + second[found]) * size + third[found]
+        trigrams = np.bincount(
+            codes, weights=usages[found], minlength=size ** 3
+        ).astype(np.int64).reshape(size, size, size)
+
+        return unigrams, bigrams, trigrams
+
+    def counter(self, n: int) -> Counter:
+        """Return counter dict of n-grams with given length."""
+        if n == 3:
+            positions, usages = self.trigrams
+            indexes = tuple(positions.T)
+        else:
+            counts = (self.unigrams, self.bigrams)[n - 1]
+            indexes = np.nonzero(counts)
+            usages = counts[indexes]
+
+        ngrams = Counter()
+        for *chars, usage in zip(*(i.tolist() for i in indexes), usages.tolist()):
+            ngrams[''.join(self.alphabet[i] for i in chars)] = usage
+
+        return ngrams
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import copy
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from internal.corpus import Corpus
+from internal.keyboard import Keyboard
+
+# Models and corpus of worker process
+_worker_state = {}
+
+
+class Optimizer():
+    """Search of layout by simulated annealing.
+
+    Layout is changed by swaps of two key mappings, scored
+    incrementally by metric deltas of swap. Several chains
+    are started independently, each one in own process.
+    """
+
+    # Metrics that can be weighted in objective
+    METRICS = (
+        'bigram_mean_distance',
+        'same_finger_bigram_frequency',
+        'same_finger_bigram_mean_distance',
+        'full_scissor_bigram_frequency',
+        'half_scissor_bigram_frequency',
+        'lateral_stretch_bigram_frequency',
+        'same_finger_skipgram_frequency',
+        'same_finger_skipgram_mean_distance',
+        'full_scissor_skipgram_frequency',
+        'half_scissor_skipgram_frequency',
+        'lateral_stretch_skipgram_frequency',
+        'alternate_frequency',
+        'roll_frequency',
+        'onehand_frequency',
+        'redirect_frequency',
+    )
+
+    def __init__(self, keyboard_model: dict, layout_model: dict, corpus: Corpus, weights: dict[str, float], pinned_keys: list[str]):
+        """Prepare search from given layout. Lower objective is better."""
+        for metric in weights:
+            if metric not in Optimizer.METRICS:
+                raise ValueError(f'Unknown metric in objective: {metric}')
+
+        self.keyboard_model = keyboard_model
+        self.layout_model = layout_model
+        self.corpus = corpus
+        self.weights = weights
+
+        # Mapped keys that can be swapped
+        self.keys = [
+            key_code for key_code, key_layout in layout_model['layout'].items()
+            if key_code in keyboard_model['keyboard']
+            and key_layout.get('mappings')
+            and not key_layout.get('is_modifier', False)
+            and key_code not in pinned_keys
+        ]
+
+    def score(self, keyboard: Keyboard) -> float:
+        """Return weighted sum of keyboard metrics."""
+        return sum(
+            weight * getattr(keyboard, metric)
+            for metric, weight in self.weights.items()
+        )
+
+    def mappings(self, keyboard: Keyboard) -> dict[str, dict]:
+        """Return mappings of swappable keys of keyboard."""
+        return {
+            key_code: keyboard.code_to_key(key_code).mappings
+            for key_code in self.keys
+        }
+
+    def layout(self, mappings: dict[str, dict]) -> dict:
+        """Return layout model with given mappings of swappable keys."""
+        layout_model = copy.deepcopy(self.layout_model)
+
+        for key_code, key_mappings in mappings.items():
+            layout_model['layout'][key_code]['mappings'] = key_mappings
+
+        return layout_model
+
+    def anneal(self, seed: int, iterations: int, start_temperature: float, end_temperature: float) -> dict:
+        """Run one chain of simulated annealing.
+
+        Temperature falls exponentially from start to end one.
+        Return best found mappings, their score and number of
+        evaluated swaps with time spent on them.
+        """
+        rng = random.Random(seed)
+        keyboard = Keyboard(self.keyboard_model, self.layout_model, self.corpus)
+
+        score = self.score(keyboard)
+        best_score = score
+        best_mappings = self.mappings(keyboard)
+
+        cooling = (end_temperature / start_temperature) ** (1 / max(iterations - 1, 1))
+        temperature = start_temperature
+        start = time.perf_counter()
+
+        for _ in range(iterations):
+            first, second = rng.sample(self.keys, 2)
+            delta = keyboard.swap_delta(first, second)
+            change = sum(weight * delta[metric] for metric, weight in self.weights.items())
+
+            if change < 0 or rng.random() < math.exp(-change / temperature):
+                keyboard.swap_keys(first, second)
+                score += change
+
+                if score < best_score:
+                    best_score = score
+                    best_mappings = self.mappings(keyboard)
+
+            temperature *= cooling
+
+        return {
+            'seed': seed,
+            'score': best_score,
+            'mappings': best_mappings,
+            'swaps': iterations,
+            'seconds': time.perf_counter() - start,
+        }
+
+    @staticmethod
+    def _init_worker(optimizer: Optimizer):
+        """Keep optimizer in worker process."""
+        _worker_state['optimizer'] = optimizer
+
+    @staticmethod
+    def _anneal_worker(args: tuple) -> dict:
+        """Run one chain of simulated annealing in worker process."""
+        return _worker_state['optimizer'].anneal(*args)
+
+    def run(self, chains: int, iterations: int, start_temperature: float, end_temperature: float, seed: int = 0, workers: int = 1) -> dict:
+        """Run independent chains and return their results with throughput.
+
+        Chains are sorted by score, best first. Scores of best
+        layouts are recalculated from scratch. Throughput is given
+        in evaluated swaps per second of wall time.
+        """
+        jobs = [
+            (seed + chain, iterations, start_temperature, end_temperature)
+            for chain in range(chains)
+        ]
+        workers = workers or os.cpu_count()
+
+        # Prepare adjacency once, so forked workers share it
+        self.corpus.counts.adjacent(2, np.zeros(0, dtype=np.int64))
+
+        start = time.perf_counter()
+
+        # Workers are forked to share corpus with them
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(
+                min(workers, chains),
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=Optimizer._init_worker,
+                initargs=(self,),
+            ) as executor:
+                results = list(executor.map(Optimizer._anneal_worker, jobs))
+        else:
+            results = [self.anneal(*job) for job in jobs]
+
+        seconds = time.perf_counter() - start
+
+        for result in results:
+            keyboard = Keyboard(self.keyboard_model, self.layout(result['mappings']), self.corpus)
+            result['score'] = self.score(keyboard)
+
+        swaps = sum(result['swaps'] for result in results)
+
+        return {
+            'chains': sorted(results, key=lambda result: result['score']),
+            'swaps': swaps,
+            'seconds': seconds,
+            'swaps_per_second': swaps / seconds if seconds else 0.0,
+        }
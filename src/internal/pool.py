@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable
+
+import numpy as np
+
+from internal.corpus import Corpus
+from internal.mapped_text import MappedText
+from internal.ngrams import NgramCounts
+
+# Corpus of worker process
+_worker_state = {}
+
+
+class SharedCounts():
+    """N-gram counts of corpus placed in shared memory once.
+
+    Only names of memory blocks are sent to workers, which
+    attach count arrays as read-only views without copying.
+    """
+
+    def __init__(self, counts: NgramCounts):
+        """Copy count arrays into new shared memory blocks."""
+        self.alphabet = counts.alphabet
+        self.head = counts.head
+        self.tail = counts.tail
+
+        self._blocks: list[shared_memory.SharedMemory] = []
+        self.arrays: list[tuple[str, tuple[int, ...]]] = []
+
+        for array in (counts.unigrams, counts.bigrams, *counts.trigram_arrays):
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=np.int64, buffer=block.buf)[...] = array
+
+            self._blocks.append(block)
+            self.arrays.append((block.name, array.shape))
+
+    def __getstate__(self) -> dict:
+        """Send only names and shapes of blocks."""
+        state = self.__dict__.copy()
+        state['_blocks'] = []
+
+        return state
+
+    def attach(self) -> NgramCounts:
+        """Return counts over shared blocks, blocks stay open while process lives."""
+        arrays = []
+        for name, shape in self.arrays:
+            block = shared_memory.SharedMemory(name=name)
+            self._blocks.append(block)
+
+            array = np.ndarray(shape, dtype=np.int64, buffer=block.buf)
+            array.flags.writeable = False
+            arrays.append(array)
+
+        return NgramCounts.from_arrays(self.alphabet, *arrays, self.head, self.tail)
+
+    def unlink(self):
+        """Free shared blocks, called by process that created them."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+        self._blocks = []
+
+
+class CorpusPool():
+    """Worker processes that share one corpus.
+
+    Workers are started by fork server, or spawned where it's
+    unavailable, so threads of parent process are not copied to
+    them. Counts of corpus are put in shared memory once, text
+    is mapped by each worker from same files. Items are split
+    between workers in contiguous parts, results keep order of
+    items.
+    """
+
+    def __init__(self, corpus: Corpus, workers: int = 0):
+        """Prepare pool for corpus. Zero workers means one per CPU core."""
+        self.corpus = corpus
+        self.workers = workers or os.cpu_count()
+
+    @staticmethod
+    def _init_worker(name: str, text: str | None, files: list | None, shared: SharedCounts):
+        """Open corpus over shared counts in worker process."""
+        corpus = Corpus(name, text)
+        corpus.counts = shared.attach()
+
+        if files is not None:
+            corpus.mapped = MappedText(files)
+
+        _worker_state['corpus'] = corpus
+
+    @staticmethod
+    def _worker(args: tuple[Callable, list, tuple]) -> list:
+        """Apply function to corpus of worker and part of items."""
+        function, items, extra = args
+        return function(_worker_state['corpus'], items, *extra)
+
+    def map(self, function: Callable[..., list], items: list, *args) -> list:
+        """Apply function to corpus, parts of items and args, return joined results.
+
+        Function must be defined at module level and return one
+        result for each item of its part. Workers import function
+        by its module and main script as `__mp_main__`, so script
+        must run its work under `if __name__ == '__main__'`.
+        Functions of running script are applied in this process.
+        """
+        workers = min(self.workers, len(items))
+
+        if workers <= 1 or function.__module__ == '__main__':
+            return function(self.corpus, items, *args)
+
+        bounds = np.linspace(0, len(items), workers + 1).astype(int)
+        parts = [items[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+        files = self.corpus.mapped.files if self.corpus.mapped else None
+        shared = SharedCounts(self.corpus.counts)
+
+        try:
+            with ProcessPoolExecutor(
+                workers,
+                mp_context=context,
+                initializer=CorpusPool._init_worker,
+                initargs=(self.corpus.name, self.corpus.text, files, shared),
+            ) as executor:
+                results = executor.map(CorpusPool._worker, [(function, part, args) for part in parts])
+                return [result for part in results for result in part]
+        finally:
+            shared.unlink()
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import pathlib
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from internal.cache import LRUCache
+from internal.corpus import Corpus
+from internal.geometry import Geometry
+from internal.keyboard import Keyboard
+from internal.models import load_model, model_digest
+from internal.optimizer import Optimizer
+from internal.setup import resolve_corpus, resolve_keyboard, resolve_layout
+
+
+class NotFound(Exception):
+    """Requested keyboard, layout or corpus doesn't exist."""
+
+
+class MetricService():
+    """Metrics of keyboards and layouts by resident corpora.
+
+    Corpora are opened once and kept in memory with their n-gram
+    counts, models and geometry are shared by `load_model` and
+    `Geometry`. Metrics of each combination are cached.
+    """
+
+    def __init__(self, cache_size: int = 1024):
+        """Create service with empty corpora and metrics cache."""
+        self.cache = LRUCache(cache_size)
+        self.corpora: dict[str, Corpus] = {}
+        self._corpora_lock = threading.Lock()
+        self._corpus_locks: dict[str, threading.Lock] = {}
+
+    def corpus(self, name: str) -> Corpus:
+        """Return corpus by name, opening it on first use."""
+        corpus = self.corpora.get(name)
+        if corpus is not None:
+            return corpus
+
+        path = resolve_corpus(name)
+        if not path.is_dir() or path.parent.name != 'clean':
+            raise NotFound(f'Unknown corpus: {name}')
+
+        # Corpus is opened once, even by concurrent requests,
+        # requests of other corpora are answered meanwhile
+        with self._corpora_lock:
+            lock = self._corpus_locks.setdefault(name, threading.Lock())
+
+        with lock:
+            if name not in self.corpora:
+                corpus = Corpus.map(path)
+
+                # Build lookups shared by all keyboards
+                corpus.skipgram_counts
+                self.corpora[name] = corpus
+
+            return self.corpora[name]
+
+    @staticmethod
+    def model(path: pathlib.Path, folder: str) -> dict:
+        """Return model by path, only models of given data folder are allowed."""
+        folder = (pathlib.Path() / 'data' / folder).resolve()
+        path = path.resolve()
+
+        if not path.is_file() or folder not in path.parents:
+            raise NotFound(f'Unknown model: {path.stem}')
+
+        return load_model(path)
+
+    @staticmethod
+    def metrics(keyboard: Keyboard) -> dict:
+        """Return all metrics of keyboard calculated without typing simulation."""
+        metrics = {metric: getattr(keyboard, metric) for metric in Optimizer.METRICS}
+
+        # Layout chars may never occur in corpus
+        if keyboard.usage == 0:
+            metrics['finger_usage_frequency'] = [0.0 for _ in Keyboard.Finger]
+            metrics['row_usage_frequency'] = [0.0 for _ in Keyboard.Row]
+            return metrics
+
+        metrics['finger_usage_frequency'] = [
+            keyboard.finger_usage_frequency(finger) for finger in Keyboard.Finger
+        ]
+        metrics['row_usage_frequency'] = [
+            keyboard.row_usage_frequency(row) for row in Keyboard.Row
+        ]
+
+        return metrics
+
+    def query(self, keyboard: str, layout: str | dict, corpus: str) -> dict:
+        """Return metrics of keyboard and layout by corpus.
+
+        Layout is given by name or as layout model.
+        """
+        keyboard_model = self.model(resolve_keyboard(keyboard), 'keyboards')
+
+        if isinstance(layout, dict):
+            if not isinstance(layout.get('layout'), dict):
+                raise ValueError('Layout model must contain layout of keys')
+
+            # Layouts sent by clients are cached by their content
+            text = json.dumps(layout, sort_keys=True, ensure_ascii=False)
+            layout_key = hashlib.sha256(text.encode()).hexdigest()
+            layout_model = {'name': layout_key, 'file': layout_key} | layout
+        else:
+            layout_model = self.model(resolve_layout(layout), 'layouts')
+            layout_key = model_digest(layout_model)
+
+        # Models are reloaded when files change, so they are cached by content
+        key = (model_digest(keyboard_model), layout_key, corpus)
+        metrics = self.cache.get(key)
+        if metrics is not None:
+            return metrics
+
+        metrics = self.metrics(Keyboard(keyboard_model, layout_model, self.corpus(corpus)))
+
+        # Overlays of sent layouts are not reused, unlike files
+        if isinstance(layout, dict):
+            Geometry.from_model(keyboard_model).release(layout_model)
+
+        self.cache.put(key, metrics)
+        return metrics
+
+
+class MetricHandler(BaseHTTPRequestHandler):
+    """JSON requests of metric server.
+
+    GET /metrics?keyboard=<keyboard>&layout=<layout>&corpus=<corpus>
+    POST /metrics with JSON of keyboard, corpus and layout name or model
+    """
+
+    server: MetricServer
+
+    @staticmethod
+    def _finite(data):
+        """Replace NaN and infinite floats with None, they are not valid JSON."""
+        if isinstance(data, dict):
+            return {key: MetricHandler._finite(value) for key, value in data.items()}
+        if isinstance(data, (list, tuple)):
+            return [MetricHandler._finite(value) for value in data]
+        if isinstance(data, float) and not math.isfinite(data):
+            return None
+
+        return data
+
+    def _send(self, status: HTTPStatus, data: dict):
+        """Send JSON response."""
+        body = json.dumps(MetricHandler._finite(data), ensure_ascii=False, allow_nan=False).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, query: dict):
+        """Send metrics for query or error."""
+        try:
+            metrics = self.server.service.query(
+                query['keyboard'], query['layout'], query['corpus']
+            )
+        except KeyError as error:
+            self._send(HTTPStatus.BAD_REQUEST, {'error': f'Missing parameter: {error.args[0]}'})
+        except NotFound as error:
+            self._send(HTTPStatus.NOT_FOUND, {'error': str(error)})
+        except (ValueError, TypeError, AttributeError) as error:
+            self._send(HTTPStatus.BAD_REQUEST, {'error': str(error)})
+        except Exception as error:
+            self.log_error('Metrics failed: %r', error)
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'Internal error'})
+        else:
+            self._send(HTTPStatus.OK, metrics)
+
+    def do_GET(self):
+        """Answer metrics of named keyboard, layout and corpus."""
+        url = urlparse(self.path)
+        if url.path != '/metrics':
+            self._send(HTTPStatus.NOT_FOUND, {'error': f'Unknown path: {url.path}'})
+            return
+
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self._answer(query)
+
+    def do_POST(self):
+        """Answer metrics of keyboard and corpus with layout sent as model."""
+        url = urlparse(self.path)
+        if url.path != '/metrics':
+            self._send(HTTPStatus.NOT_FOUND, {'error': f'Unknown path: {url.path}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            query = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send(HTTPStatus.BAD_REQUEST, {'error': 'Body must be JSON'})
+            return
+
+        if not isinstance(query, dict):
+            self._send(HTTPStatus.BAD_REQUEST, {'error': 'Body must be JSON object'})
+            return
+
+        self._answer(query)
+
+    def log_message(self, format, *args):
+        """Log requests only in verbose mode."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MetricServer(ThreadingHTTPServer):
+    """HTTP server of metrics, each request is handled in own thread."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: MetricService, verbose: bool = False):
+        """Bind server to address, requests are answered by service."""
+        super().__init__(address, MetricHandler)
+        self.service = service
+        self.verbose = verbose
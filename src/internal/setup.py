@@ -134,6 +134,76 @@ def add_argument(argument: str, parser: argparse.ArgumentParser, ARGS: dict):
                 type=str,
             )
 
+        case "workers":
+            parser.add_argument(
+                "--workers",
+                help=(
+                    "Number of processes to count corpus n-grams, simulate typing,"
+                    " calculate combinations and run optimizer chains, 0 uses all cores"
+                ),
+                default=ARGS["workers"],
+                type=int,
+                dest="workers",
+            )
+
+        # API
+        case "only_changed":
+            parser.add_argument(
+                "--only-changed",
+                help="Calculate only combinations with inputs changed since last run",
+                action="store_const",
+                const=not ARGS["only_changed"],
+                default=ARGS["only_changed"],
+                dest="only_changed",
+            )
+
+        case "batch_size":
+            parser.add_argument(
+                "--batch-size",
+                help="Rows sent by one request to bulk endpoint of backend, 1 sends each row separately",
+                default=ARGS["batch_size"],
+                type=int,
+                dest="batch_size",
+            )
+
+        case "export":
+            parser.add_argument(
+                "--export",
+                help="Export metrics to .parquet or .sqlite file instead of backend API",
+                default=ARGS["export"],
+                type=str,
+                dest="export",
+            )
+
+        # Server
+        case "port":
+            parser.add_argument(
+                "--port",
+                help="Port of metric server on local host",
+                default=ARGS["port"],
+                type=int,
+                dest="port",
+            )
+
+        # Optimizer
+        case "chains":
+            parser.add_argument(
+                "--chains",
+                help="Number of independent annealing chains",
+                default=ARGS["chains"],
+                type=int,
+                dest="chains",
+            )
+
+        case "iterations":
+            parser.add_argument(
+                "--iterations",
+                help="Number of evaluated swaps in each chain",
+                default=ARGS["iterations"],
+                type=int,
+                dest="iterations",
+            )
+
 
 def resolve_corpus(corpus: str, raw: bool = False) -> pathlib.Path:
     """Resolve corpus folder path by name."""
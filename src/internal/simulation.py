@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import pathlib
+
+from internal.corpus import Corpus
+from internal.hands import Hands
+from internal.keyboard import Keyboard
+from internal.visualizer import Visualizer
+
+
+def simulate(corpus: Corpus, model_paths: list[tuple[pathlib.Path, pathlib.Path]], visualizer_args: dict) -> list[tuple[Hands, str]]:
+    """Calculate travel distance and render heatmap of combinations.
+
+    Runs in worker processes of `CorpusPool`, each one takes part
+    of keyboard and layout paths and types them all by one corpus
+    pass. Return hands and heatmap file of each combination.
+    """
+    keyboards = [
+        Keyboard.load(keyboard_path, layout_path, corpus)
+        for keyboard_path, layout_path in model_paths
+    ]
+
+    # Simulate typing for travel distance of all layouts by one corpus pass
+    hands_list = Hands.simulate_typing_batch(keyboards, corpus, False)
+
+    heatmap_filenames = []
+    for keyboard in keyboards:
+        # Generate frequency heatmap
+        visualizer = Visualizer(keyboard, visualizer_args)
+        visualizer.render(visualizer_args['layers'])
+        heatmap_filename = f'{keyboard.layout_file}_{keyboard.file}_{corpus.name}.png'
+        visualizer.savefig(heatmap_filename, dpi=300, transparent=True)
+        visualizer.close()
+
+        heatmap_filenames.append(heatmap_filename)
+
+    return list(zip(hands_list, heatmap_filenames))
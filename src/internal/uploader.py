@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import pathlib
+import queue
+import threading
+from typing import Callable, Iterator
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HTTPTransport():
+    """Requests to backend API over pooled session.
+
+    Other transports, like fake backend for local runs, must
+    provide same `request` method returning decoded JSON. Path
+    is relative to API or full url, like url of next page.
+    """
+
+    def __init__(self, api_url: str, auth: tuple[str, str] | None = None, connections: int = 4):
+        """Open session to API at given url."""
+        self.api_url = api_url.rstrip('/')
+
+        # Connections are kept alive and reused by all threads
+        self.session = requests.Session()
+        self.session.auth = auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method: str, path: str, **kwargs) -> list | dict | None:
+        """Send request to API path and return decoded response."""
+        url = path if urlparse(path).scheme else f'{self.api_url}/{path}'
+        response = self.session.request(method, url, **kwargs)
+        response.raise_for_status()
+
+        return response.json() if response.content else None
+
+    def close(self):
+        """Close connections."""
+        self.session.close()
+
+
+class MemoryTransport():
+    """In-memory stand-in for backend API, used to test uploads.
+
+    Rows of resources are kept by ids, stored files by their names.
+    Lists are paginated by `page_size`, if it's given, and filtered
+    by `search` in names of rows. If `fail(method, path)` returns
+    error, request raises it instead of being handled.
+    """
+
+    def __init__(self, rows: dict[str, list[dict]] | None = None, page_size: int | None = None, fail: Callable | None = None):
+        """Create backend with given rows of resources."""
+        self.resources: dict[str, dict[int, dict]] = {
+            resource: {row['id']: dict(row) for row in resource_rows}
+            for resource, resource_rows in (rows or {}).items()
+        }
+        self.page_size = page_size
+        self.fail = fail
+
+        # Sent requests as method and path
+        self.requests: list[tuple[str, str]] = []
+
+        self._next_id = 1 + max(
+            (row_id for resource_rows in self.resources.values() for row_id in resource_rows),
+            default=0,
+        )
+        self._lock = threading.Lock()
+
+    def _list(self, resource: str, params: dict) -> list | dict:
+        """Return rows of resource, paginated if page size is given."""
+        rows = list(self.resources.get(resource, {}).values())
+        if 'search' in params:
+            rows = [row for row in rows if row.get('name') == params['search']]
+
+        if self.page_size is None:
+            return rows
+
+        page = int(params.get('page', 1))
+        start = (page - 1) * self.page_size
+        more = start + self.page_size < len(rows)
+
+        return {
+            'results': rows[start:start + self.page_size],
+            'next': f'memory:///{resource}/?page={page + 1}' if more else None,
+        }
+
+    def _create(self, resource: str, row: dict, files: dict) -> dict:
+        """Store new row with names of its files, return it with id."""
+        row = dict(row, id=self._next_id)
+        self._next_id += 1
+
+        for field, file in files.items():
+            row[field] = pathlib.Path(file.name).name
+
+        self.resources.setdefault(resource, {})[row['id']] = row
+        return {'id': row['id']}
+
+    def request(self, method: str, path: str, **kwargs) -> list | dict | None:
+        """Handle request to API path same way as backend does."""
+        url = urlparse(path)
+        resource, *rest = [part for part in url.path.split('/') if part]
+        files = kwargs.get('files') or {}
+
+        with self._lock:
+            self.requests.append((method, path))
+
+            error = self.fail(method, path) if self.fail else None
+            if error is not None:
+                raise error
+
+            if method == 'GET':
+                return self._list(resource, kwargs.get('params') or dict(parse_qsl(url.query)))
+
+            if method == 'POST' and rest == ['bulk']:
+                # Files are matched with rows by their position in batch
+                row_files: dict[int, dict] = {}
+                for key, file in files.items():
+                    field, _, i = key.rpartition('_')
+                    row_files.setdefault(int(i), {})[field] = file
+
+                return [
+                    self._create(resource, row, row_files.get(i, {}))
+                    for i, row in enumerate(json.loads(kwargs['data']['rows']))
+                ]
+
+            if method == 'POST':
+                return self._create(resource, kwargs['data'], files)
+
+            if method == 'PATCH':
+                rows = kwargs['json'] if rest == ['bulk'] else [dict(kwargs['data'], id=int(rest[0]))]
+                for row in rows:
+                    self.resources[resource][row['id']].update(row)
+                return None
+
+        raise ValueError(f'Unsupported request: {method} {path}')
+
+    def close(self):
+        """Nothing to close, same interface as `HTTPTransport`."""
+
+
+class Uploader():
+    """Upload of rows of one API resource in background threads.
+
+    Rows are put in bounded queue by batches and uploaded by
+    several threads, so uploads overlap with calculation of next
+    rows. Ids of existing rows are requested once and kept in
+    local index, so rows are created or updated without checks.
+
+    Batch of one row is sent by separate requests, larger ones
+    are sent to bulk endpoint of resource by one request for
+    created and one for updated rows.
+    """
+
+    def __init__(self, transport: HTTPTransport | MemoryTransport, resource: str, key_fields: tuple[str, ...], file_field: str | None = None, workers: int = 4, batch_size: int = 1, queue_size: int = 16):
+        """Start upload threads for resource, rows are identified by key fields."""
+        self.transport = transport
+        self.resource = resource
+        self.key_fields = key_fields
+        self.file_field = file_field
+        self.batch_size = batch_size
+
+        self._ids: dict[tuple[str, str], int] = {}
+        self._ids_lock = threading.Lock()
+
+        # Ids of existing rows by values of key fields
+        self._index: dict[tuple, int] | None = None
+        self._index_lock = threading.Lock()
+
+        self._batch: list[tuple[dict, str | None, Callable | None]] = []
+
+        self.created = 0
+        self.updated = 0
+        self.errors: list[tuple[dict, Exception]] = []
+        self._counts_lock = threading.Lock()
+
+        # Full queue blocks calculation until uploads catch up
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def resource_id(self, resource: str, search: str) -> int:
+        """Return id of keyboard, layout or corpus found by name."""
+        key = (resource, search)
+
+        with self._ids_lock:
+            if key in self._ids:
+                return self._ids[key]
+
+        found = next(self._pages(f'{resource}/', {'search': search}), None)
+        if found is None:
+            raise LookupError(f'Not found in {resource}: {search}')
+        if not isinstance(found, dict) or 'id' not in found:
+            raise ValueError(f'Unexpected row of {resource}: {found!r}')
+
+        with self._ids_lock:
+            self._ids[key] = found['id']
+
+        return found['id']
+
+    def _pages(self, path: str, params: dict | None = None) -> Iterator:
+        """Yield rows of all pages of API list.
+
+        List response is whole list, paginated one is object with
+        rows in `results` and url of next page in `next`.
+        """
+        while path:
+            page = self.transport.request('GET', path, params=params)
+
+            if isinstance(page, list):
+                yield from page
+                return
+
+            if not isinstance(page, dict) or not isinstance(page.get('results'), list):
+                raise ValueError(f'Unexpected response of {path}: {page!r:.200}')
+
+            yield from page['results']
+
+            # Url of next page already contains parameters
+            path, params = page.get('next'), None
+
+    def _key(self, row: dict) -> tuple:
+        """Return values of key fields of row."""
+        return tuple(row[field] for field in self.key_fields)
+
+    def _existing_key(self, row: dict) -> tuple:
+        """Return key fields of row of API response.
+
+        Related rows are given by id or as nested objects with id.
+        """
+        if not isinstance(row, dict) or 'id' not in row:
+            raise ValueError(f'Unexpected row of {self.resource}: {row!r:.200}')
+
+        key = []
+        for field in self.key_fields:
+            value = row.get(field)
+            if isinstance(value, dict):
+                value = value.get('id')
+
+            if value is None:
+                raise ValueError(f'Row of {self.resource} has no {field}: {row!r:.200}')
+
+            key.append(value)
+
+        return tuple(key)
+
+    @property
+    def index(self) -> dict[tuple, int]:
+        """Return ids of existing rows, all pages are requested on first use."""
+        with self._index_lock:
+            if self._index is None:
+                self._index = {
+                    self._existing_key(row): row['id']
+                    for row in self._pages(f'{self.resource}/')
+                }
+
+            return self._index
+
+    def _create(self, rows: list[dict], file_paths: list[str | None]):
+        """Create rows with files and add their ids to index."""
+        with contextlib.ExitStack() as stack:
+            if len(rows) == 1:
+                files = None
+                if file_paths[0] is not None:
+                    files = {self.file_field: stack.enter_context(open(file_paths[0], 'rb'))}
+
+                created = [self.transport.request('POST', f'{self.resource}/', data=rows[0], files=files)]
+            else:
+                # Files are matched with rows by their position in batch
+                files = {
+                    f'{self.file_field}_{i}': stack.enter_context(open(file_path, 'rb'))
+                    for i, file_path in enumerate(file_paths)
+                    if file_path is not None
+                }
+                created = self.transport.request(
+                    'POST', f'{self.resource}/bulk/', data={'rows': json.dumps(rows)}, files=files
+                )
+
+        with self._index_lock:
+            for row, created_row in zip(rows, created or []):
+                if created_row and 'id' in created_row:
+                    self._index[self._key(row)] = created_row['id']
+
+    def _update(self, rows: list[dict]):
+        """Update all but files of existing rows."""
+        if len(rows) == 1:
+            self.transport.request('PATCH', f'{self.resource}/{rows[0]["id"]}/', data=rows[0])
+        else:
+            self.transport.request('PATCH', f'{self.resource}/bulk/', json=rows)
+
+    def upsert(self, batch: list[tuple[dict, str | None, Callable | None]]):
+        """Create new rows of batch and update existing ones.
+
+        Callbacks of rows are called after whole batch is uploaded.
+        """
+        index = self.index
+
+        created, file_paths, updated = [], [], []
+        for row, file_path, _ in batch:
+            row_id = index.get(self._key(row))
+
+            if row_id is None:
+                created.append(row)
+                file_paths.append(file_path)
+            else:
+                updated.append(row | {'id': row_id})
+
+        if created:
+            self._create(created, file_paths)
+        if updated:
+            self._update(updated)
+
+        with self._counts_lock:
+            self.created += len(created)
+            self.updated += len(updated)
+
+        # Rows are uploaded, so failed callback fails only its row
+        for row, _, done in batch:
+            if done is None:
+                continue
+
+            try:
+                done()
+            except Exception as error:
+                with self._counts_lock:
+                    self.errors.append((row, error))
+
+    def _work(self):
+        """Upload batches from queue until it's closed."""
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                self._queue.task_done()
+                return
+
+            # Any error fails only its batch, so thread keeps emptying queue
+            try:
+                self.upsert(batch)
+            except Exception as error:
+                with self._counts_lock:
+                    self.errors.extend((row, error) for row, _, _ in batch)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, row: dict, file_path: str | None = None, done: Callable | None = None):
+        """Add row to batch, full batch is put in upload queue.
+
+        Optional `done` is called once row is uploaded.
+        """
+        self._batch.append((row, file_path, done))
+
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Put collected rows in upload queue, waits if queue is full."""
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+
+    def close(self):
+        """Upload rest of rows and stop upload threads."""
+        self.flush()
+
+        for _ in self._threads:
+            self._queue.put(None)
+
+        for thread in self._threads:
+            thread.join()
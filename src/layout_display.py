@@ -9,7 +9,7 @@ from internal.visualizer import Visualizer
 
 ARGS = setup('layout_display')
 
-corpus = Corpus.load(ARGS['corpus'])
+corpus = Corpus.load(ARGS['corpus'], workers=ARGS['workers'])
 # corpus = Corpus.load_mockup('data/frequencies/keylogger.yaml')
 keyboard = Keyboard.load(ARGS['keyboard'], ARGS['layout'], corpus)
 
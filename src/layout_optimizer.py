@@ -0,0 +1,63 @@
+"""
+Used to search better layouts by simulated annealing.
+Writes best found layouts as layout files to data/<output>,
+outside of data/layouts, so API scripts don't pick them up.
+"""
+
+import yaml
+
+from internal.corpus import Corpus
+from internal.models import load_model
+from internal.optimizer import Optimizer
+from internal.setup import *
+
+ARGS = setup('layout_optimizer')
+
+corpus = Corpus.load(ARGS['corpus'], workers=ARGS['workers'])
+keyboard_model = load_model(ARGS['keyboard'])
+layout_model = load_model(ARGS['layout'])
+
+optimizer = Optimizer(
+    keyboard_model,
+    layout_model,
+    corpus,
+    ARGS['weights'],
+    ARGS['pinned_keys'],
+)
+
+print(f'Optimizing {layout_model["name"]} on {keyboard_model["name"]} by {corpus.name}')
+print(f'Swappable keys: {len(optimizer.keys)}, chains: {ARGS["chains"]}\n')
+
+result = optimizer.run(
+    ARGS['chains'],
+    ARGS['iterations'],
+    ARGS['start_temperature'],
+    ARGS['end_temperature'],
+    ARGS['seed'],
+    ARGS['workers'],
+)
+
+print(f'Swaps per second: {result["swaps_per_second"]:.0f}')
+print(f'Evaluated swaps: {result["swaps"]} in {result["seconds"]:.1f}s\n')
+
+for chain in result['chains']:
+    print(
+        f'Chain {chain["seed"]}: score {chain["score"]:.6f}, '
+        f'{chain["swaps"] / chain["seconds"]:.0f} swaps/s'
+    )
+
+# Save best layouts, they are compared by --layout ../<output>/<file>
+output_folder = pathlib.Path() / 'data' / ARGS['output']
+output_folder.mkdir(parents=True, exist_ok=True)
+
+for i, chain in enumerate(result['chains'][:ARGS['save_layouts']], 1):
+    optimized = optimizer.layout(chain['mappings'])
+    optimized['name'] = f'{layout_model["name"]} optimized {i}'
+    optimized['file'] = f'{layout_model["file"]}_optimized_{i}'
+
+    layout_path = output_folder / f'{optimized["file"]}.yaml'
+    with open(layout_path, 'w', encoding='utf-8') as file:
+        file.write(f'# Score: {chain["score"]:.6f}, seed: {chain["seed"]}\n')
+        yaml.safe_dump(optimized, file, allow_unicode=True, sort_keys=False)
+
+    print(f'Saved: {layout_path}')
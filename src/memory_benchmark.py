@@ -0,0 +1,44 @@
+"""
+Used to measure memory of keyboard models.
+Builds many keyboards with their keys and hands
+and prints memory taken by one of each object.
+"""
+
+import tracemalloc
+
+from internal.corpus import Corpus
+from internal.hands import Hands
+from internal.key import Key
+from internal.keyboard import Keyboard
+from internal.models import load_model
+from internal.setup import *
+
+ARGS = setup('memory_benchmark')
+
+COUNT = 1000
+
+keyboard_model = load_model(ARGS['keyboard'])
+layout_model = load_model(ARGS['layout'])
+corpus = Corpus('benchmark', '')
+
+
+def measure(create) -> tuple[list, float]:
+    """Create objects and return them with memory taken by one object."""
+    tracemalloc.start()
+    objects = [create() for _ in range(COUNT)]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return objects, memory / COUNT
+
+
+# Geometry and overlay are shared, so first keyboard is not counted
+keyboard = Keyboard(keyboard_model, layout_model, corpus)
+
+keyboards, keyboard_memory = measure(lambda: Keyboard(keyboard_model, layout_model, corpus))
+keys, keys_memory = measure(lambda: [Key(keyboard, i) for i in range(len(keyboard.geometry))])
+hands, hands_memory = measure(lambda: Hands(keyboard))
+
+print(f'Keyboard: {keyboard_memory:,.0f} B')
+print(f'Keys: {keys_memory:,.0f} B, {keys_memory / len(keyboard.geometry):,.0f} B per key')
+print(f'Hands: {hands_memory:,.0f} B with {len(Keyboard.Finger)} fingers')
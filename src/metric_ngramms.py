@@ -9,7 +9,7 @@ from internal.setup import *
 
 ARGS = setup('metric_ngramms')
 
-corpus = Corpus.load(ARGS['corpus'])
+corpus = Corpus.load(ARGS['corpus'], workers=ARGS['workers'])
 # corpus = Corpus('custom', 'burn')
 keyboard = Keyboard.load(ARGS['keyboard'], ARGS['layout'], corpus)
 hands = Hands(keyboard)
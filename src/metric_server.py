@@ -0,0 +1,32 @@
+"""
+Used to answer metric queries from other services.
+Keeps corpora and models in memory and answers
+metrics of keyboards and layouts as JSON by HTTP.
+"""
+
+import time
+
+from internal.server import MetricServer, MetricService
+from internal.setup import *
+
+ARGS = setup('metric_server')
+
+service = MetricService(ARGS['cache_size'])
+
+start = time.perf_counter()
+
+for corpus_name in ARGS['corpora']:
+    service.corpus(corpus_name)
+    print(f'Opened: {corpus_name}')
+
+print(f'\nOpened {len(ARGS["corpora"])} corpora in {time.perf_counter() - start:.2f}s')
+
+server = MetricServer((ARGS['host'], ARGS['port']), service, ARGS['verbose'])
+print(f'Serving on http://{ARGS["host"]}:{ARGS["port"]}/metrics')
+
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    print('\nStopped')
+finally:
+    server.server_close()
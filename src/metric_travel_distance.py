@@ -9,14 +9,14 @@ from internal.setup import *
 
 ARGS = setup('metric_travel_distance')
 
-corpus = Corpus.load(ARGS['corpus'])
+corpus = Corpus.map(ARGS['corpus'])
 # corpus = Corpus('custom', 'привет')
 keyboard = Keyboard.load(ARGS['keyboard'], ARGS['layout'], corpus)
 hands = Hands(keyboard)
 
 # Emulate
 print(keyboard.info(), '\n')
-hands.simulate_typing(keyboard, corpus)
+hands.simulate_typing(keyboard, corpus, workers=ARGS['workers'])
 
 report = {
     'travel_distance': hands.travel_distance,
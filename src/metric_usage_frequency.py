@@ -8,7 +8,7 @@ from internal.setup import *
 
 ARGS = setup('metric_usage_frequency')
 
-corpus = Corpus.load(ARGS['corpus'])
+corpus = Corpus.load(ARGS['corpus'], workers=ARGS['workers'])
 keyboard = Keyboard.load(ARGS['keyboard'], ARGS['layout'], corpus)
 
 # Emulated by loading
@@ -0,0 +1,24 @@
+"""
+Used to compile keyboard and layout models.
+Parsed models are cached in binary form and
+reused by other scripts while files don't change.
+"""
+
+import pathlib
+import time
+
+from internal.models import compile_model
+
+data_folder = pathlib.Path() / 'data'
+model_paths = [
+    *(data_folder / 'keyboards').glob('*.yaml'),
+    *(data_folder / 'layouts').glob('**/*.yaml'),
+]
+
+start = time.perf_counter()
+
+for model_path in model_paths:
+    compile_model(model_path)
+    print(f'Compiled: {model_path}')
+
+print(f'\nCompiled {len(model_paths)} models in {time.perf_counter() - start:.2f}s')
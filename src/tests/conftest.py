@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# Tests import modules of scripts folder, same as scripts do
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
@@ -0,0 +1,148 @@
+import pathlib
+
+import pytest
+
+from internal.manifest import Manifest
+from internal.uploader import MemoryTransport, Uploader
+
+
+def upload(transport, rows, batch_size=1, file_path=None):
+    """Upload rows with callbacks, return uploader and finished rows."""
+    uploader = Uploader(transport, 'metrics', ('keyboard', 'layout'), 'heatmap', 2, batch_size)
+    finished = []
+
+    for row in rows:
+        uploader.submit(row, file_path, lambda row=row: finished.append(row))
+
+    uploader.close()
+    return uploader, finished
+
+
+def rows(count, value=0):
+    return [{'keyboard': 1, 'layout': i, 'value': value} for i in range(count)]
+
+
+def test_created():
+    transport = MemoryTransport()
+    uploader, finished = upload(transport, rows(3))
+
+    assert (uploader.created, uploader.updated, uploader.errors) == (3, 0, [])
+    assert len(finished) == 3
+    assert len(transport.resources['metrics']) == 3
+    assert transport.requests.count(('POST', 'metrics/')) == 3
+
+
+def test_updated_by_index_of_all_pages():
+    existing = [dict(row, id=i + 1) for i, row in enumerate(rows(5))]
+    transport = MemoryTransport({'metrics': existing}, page_size=2)
+    uploader, finished = upload(transport, rows(5, value=1))
+
+    assert (uploader.created, uploader.updated, uploader.errors) == (0, 5, [])
+    assert len(finished) == 5
+    assert [row['value'] for row in transport.resources['metrics'].values()] == [1] * 5
+
+    # Index is requested once, by three pages
+    assert [path for method, path in transport.requests if method == 'GET'] == [
+        'metrics/', 'memory:///metrics/?page=2', 'memory:///metrics/?page=3',
+    ]
+
+
+def test_nested_keys_of_existing_rows():
+    existing = [{'id': 7, 'keyboard': {'id': 1}, 'layout': {'id': 0}, 'value': 0}]
+    uploader, _ = upload(MemoryTransport({'metrics': existing}), rows(1, value=1))
+
+    assert (uploader.created, uploader.updated) == (0, 1)
+
+
+def test_bulk_batches_with_files(tmp_path):
+    file_path = tmp_path / 'heatmap.png'
+    file_path.write_bytes(b'png')
+
+    transport = MemoryTransport()
+    uploader, finished = upload(transport, rows(5), batch_size=3, file_path=file_path)
+
+    assert (uploader.created, uploader.errors) == (5, [])
+    assert len(finished) == 5
+    assert transport.requests.count(('POST', 'metrics/bulk/')) == 2
+    assert all(row['heatmap'] == 'heatmap.png' for row in transport.resources['metrics'].values())
+
+    # Rows created by bulk request are updated by next run
+    uploader, _ = upload(transport, rows(5, value=1), batch_size=3)
+    assert (uploader.created, uploader.updated) == (0, 5)
+    assert transport.requests.count(('PATCH', 'metrics/bulk/')) == 2
+
+
+def test_failed_batch_keeps_uploading():
+    failed = []
+
+    def fail(method, path):
+        if method == 'POST' and not failed:
+            failed.append(path)
+            return ConnectionError('Backend restarted')
+
+    transport = MemoryTransport(fail=fail)
+    uploader, finished = upload(transport, rows(4))
+
+    assert (uploader.created, len(uploader.errors)) == (3, 1)
+    assert isinstance(uploader.errors[0][1], ConnectionError)
+
+    # Failed row is not finished, so next run uploads it again
+    assert uploader.errors[0][0] not in finished
+    assert len(finished) == 3
+
+
+def test_unexpected_index_fails_all_rows():
+    transport = MemoryTransport({'metrics': [{'id': 1, 'value': 0}]})
+    uploader, finished = upload(transport, rows(2))
+
+    assert (uploader.created, uploader.updated, finished) == (0, 0, [])
+    assert len(uploader.errors) == 2
+    assert all(isinstance(error, ValueError) for _, error in uploader.errors)
+
+
+def test_failed_callback_fails_only_its_row():
+    uploader = Uploader(MemoryTransport(), 'metrics', ('keyboard', 'layout'), None, 1, 2)
+
+    def done():
+        raise OSError('Manifest is not saved')
+
+    first, second = rows(2)
+    uploader.submit(first, None, done)
+    uploader.submit(second)
+    uploader.close()
+
+    assert (uploader.created, len(uploader.errors)) == (2, 1)
+    assert uploader.errors[0][0] is first
+    assert isinstance(uploader.errors[0][1], OSError)
+
+
+def test_resource_id():
+    transport = MemoryTransport({'layouts': [{'id': 3, 'name': 'QWERTY'}]}, page_size=1)
+    uploader = Uploader(transport, 'metrics', ('keyboard', 'layout'))
+
+    assert uploader.resource_id('layouts', 'QWERTY') == 3
+    assert uploader.resource_id('layouts', 'QWERTY') == 3
+    assert transport.requests.count(('GET', 'layouts/')) == 1
+
+    with pytest.raises(LookupError):
+        uploader.resource_id('layouts', 'Dvorak')
+
+    uploader.close()
+
+
+def test_skipped_by_manifest(tmp_path: pathlib.Path):
+    path = tmp_path / 'manifest.json'
+    inputs = Manifest.inputs_hash('corpus', 'keyboard', 'layout')
+
+    # Uploaded rows finish jobs, failed ones don't
+    manifest = Manifest(path)
+    transport = MemoryTransport()
+    uploader = Uploader(transport, 'metrics', ('keyboard', 'layout'))
+    uploader.submit(rows(1)[0], None, lambda: manifest.finish('job', inputs))
+    uploader.close()
+    manifest.close(complete=not uploader.errors)
+
+    # Complete run starts anew, unless only changed jobs are asked
+    assert not Manifest(path).is_done('job', inputs)
+    assert Manifest(path, only_changed=True).is_done('job', inputs)
+    assert not Manifest(path, only_changed=True).is_done('job', Manifest.inputs_hash('changed'))